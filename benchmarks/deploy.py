@@ -0,0 +1,705 @@
+""" Run the CloudFormation deployment of pete against local stand-ins of S3 and CloudFormation
+
+	The stand-ins follow a virtual clock, so waiting for a stack takes no real time. The harness measures
+	how long pete itself takes and how many AWS calls it makes.
+
+	Usage:
+		python benchmarks/deploy.py                      Run the scenarios and compare with the baseline
+		python benchmarks/deploy.py --save               Run the scenarios and save them as the baseline
+		python benchmarks/deploy.py --resources 50 --files 2000 --verbose
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Use the pete in this repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import botocore.exceptions  # noqa: E402
+
+from tpd_pete.actions.deploymentaction import DeploymentAction  # noqa: E402
+from tpd_pete.tools.boto import BotoTool  # noqa: E402
+from tpd_pete.tools.stackwaiter import StackWaiter  # noqa: E402
+from tpd_pete.tools.timing import TimingTool  # noqa: E402
+
+
+class VirtualClock(object):
+	""" A clock which only moves when something waits
+	"""
+
+	def __init__(self):
+		""" Start the clock at zero
+		"""
+		self.now = 0.0
+		self.waited = 0.0
+		self.sleeps = 0
+		self._lock = threading.Lock()
+
+	def sleep(self, seconds):
+		""" Move the clock forward instead of waiting
+		"""
+		with self._lock:
+			self.now += seconds
+			self.waited += seconds
+			self.sleeps += 1
+
+	def time(self):
+		""" Get the time in seconds
+		"""
+		return self.now
+
+
+class FakeAWS(object):
+	""" The state of the local S3 and CloudFormation, shared by all the clients
+	"""
+
+	# Number of events CloudFormation returns per page
+	EVENTS_PER_PAGE = 100
+
+	# Number of resources CloudFormation changes at the same time
+	PARALLEL_RESOURCES = 5
+
+	def __init__(self, clock, resourceDelay=10.0, changeSetDelay=5.0):
+		""" Create the empty state
+
+			Parameters:
+				clock: The VirtualClock
+				resourceDelay: Number of virtual seconds CloudFormation takes per resource
+				changeSetDelay: Number of virtual seconds CloudFormation takes to create a change set
+		"""
+		self.clock = clock
+		self.resourceDelay = resourceDelay
+		self.changeSetDelay = changeSetDelay
+
+		# The objects per bucket, the stacks by name and the API calls
+		self.buckets = {}
+		self.stacks = {}
+		self.calls = Counter()
+		self.lock = threading.RLock()
+		self.eventCount = 0
+
+	def client(self, resourceType, region):
+		""" Create a client
+
+			Returns FakeS3 or FakeCloudFormation
+		"""
+		if resourceType == "s3":
+			return FakeS3(self, region)
+		if resourceType == "cloudformation":
+			return FakeCloudFormation(self, region)
+		raise Exception("The harness does not support %s" % resourceType)
+
+	def record(self, service, operation):
+		""" Count an API call
+		"""
+		with self.lock:
+			self.calls["%s.%s" % (service, operation)] += 1
+
+	def getObject(self, bucket, key):
+		""" Get the content of an object
+
+			Returns bytes
+		"""
+		with self.lock:
+			if key not in self.buckets.get(bucket, {}):
+				raise botocore.exceptions.ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, "HeadObject")
+			return self.buckets[bucket][key]
+
+	def putObject(self, bucket, key, data):
+		""" Store an object
+		"""
+		with self.lock:
+			self.buckets.setdefault(bucket, {})[key] = bytes(data)
+
+
+class FakeS3(object):
+	""" The part of the S3 client pete uses
+	"""
+
+	def __init__(self, aws, region):
+		self.aws = aws
+		self.region = region
+		self.uploads = {}
+
+	def upload_file(self, Filename, Bucket, Key, Config=None, Callback=None, ExtraArgs=None):
+		self.aws.record("s3", "upload_file")
+
+		# Read the file
+		f = open(Filename, "rb")
+		data = f.read()
+		f.close()
+
+		# Store the object and report the progress
+		self.aws.putObject(Bucket, Key, data)
+		if Callback is not None:
+			Callback(len(data))
+
+	def head_object(self, Bucket, Key):
+		self.aws.record("s3", "head_object")
+		return {"ContentLength": len(self.aws.getObject(Bucket, Key))}
+
+	def copy(self, CopySource, Bucket, Key, SourceClient=None, Config=None):
+		self.aws.record("s3", "copy")
+		self.aws.putObject(Bucket, Key, self.aws.getObject(CopySource["Bucket"], CopySource["Key"]))
+
+	def create_multipart_upload(self, Bucket, Key):
+		self.aws.record("s3", "create_multipart_upload")
+		uploadId = "upload-%i" % len(self.uploads)
+		self.uploads[uploadId] = {}
+		return {"UploadId": uploadId}
+
+	def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+		self.aws.record("s3", "upload_part")
+		self.uploads[UploadId][PartNumber] = Body
+		return {"ETag": "etag-%i" % PartNumber}
+
+	def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+		self.aws.record("s3", "complete_multipart_upload")
+		parts = self.uploads.pop(UploadId)
+		self.aws.putObject(Bucket, Key, b"".join(parts[part["PartNumber"]] for part in MultipartUpload["Parts"]))
+
+	def abort_multipart_upload(self, Bucket, Key, UploadId):
+		self.aws.record("s3", "abort_multipart_upload")
+		self.uploads.pop(UploadId, None)
+
+
+class FakeCloudFormation(object):
+	""" The part of the CloudFormation client pete uses, the stacks change in virtual time
+	"""
+
+	def __init__(self, aws, region):
+		self.aws = aws
+		self.region = region
+
+	def describe_stacks(self, StackName):
+		self.aws.record("cloudformation", "describe_stacks")
+		stack = self._getStack(StackName)
+
+		return {"Stacks": [{
+			"StackName": StackName,
+			"StackStatus": self._getStatus(stack),
+			"Parameters": stack["parameters"],
+			"Outputs": []
+		}]}
+
+	def describe_stack_events(self, StackName, NextToken=None):
+		self.aws.record("cloudformation", "describe_stack_events")
+		stack = self._getStack(StackName)
+
+		# Get the events which already happened, newest first
+		events = [event for event in reversed(stack["events"]) if event["Timestamp"] <= self.aws.clock.time()]
+
+		# Get the page
+		start = int(NextToken) if NextToken is not None else 0
+		response = {"StackEvents": events[start:start + FakeAWS.EVENTS_PER_PAGE]}
+		if start + FakeAWS.EVENTS_PER_PAGE < len(events):
+			response["NextToken"] = str(start + FakeAWS.EVENTS_PER_PAGE)
+
+		return response
+
+	def get_template(self, StackName, TemplateStage=None):
+		self.aws.record("cloudformation", "get_template")
+		return {"TemplateBody": json.dumps(self._getStack(StackName)["template"])}
+
+	def create_stack(self, StackName, TemplateURL, Parameters, Capabilities=None, Tags=None, ClientRequestToken=None):
+		self.aws.record("cloudformation", "create_stack")
+
+		with self.aws.lock:
+			# Check if the stack exists
+			if StackName in self.aws.stacks:
+				raise self._getError("AlreadyExistsException", "Stack [%s] already exists" % StackName)
+
+			# Create the stack
+			stack = {"template": {"Resources": {}}, "parameters": [], "events": [], "changeSets": {}}
+			self.aws.stacks[StackName] = stack
+			self._change(StackName, stack, "CREATE", self._getTemplate(TemplateURL), Parameters, ClientRequestToken)
+
+	def create_change_set(self, StackName, ChangeSetName, TemplateURL, Parameters, ChangeSetType="UPDATE", Capabilities=None, Tags=None):
+		self.aws.record("cloudformation", "create_change_set")
+
+		with self.aws.lock:
+			# A new stack waits for review until the change set is executed
+			if ChangeSetType == "CREATE" and StackName not in self.aws.stacks:
+				self.aws.stacks[StackName] = {"template": {"Resources": {}}, "parameters": [], "events": [], "changeSets": {}, "status": "REVIEW_IN_PROGRESS"}
+			stack = self._getStack(StackName)
+
+			# Check if the change set type fits the stack
+			inReview = self._getStatus(stack) == "REVIEW_IN_PROGRESS"
+			if inReview != (ChangeSetType == "CREATE"):
+				raise self._getError("ValidationError", "Stack:%s is in %s state and can not be used with a %s change set" % (StackName, self._getStatus(stack), ChangeSetType))
+
+			# The change set is ready after a while
+			stack["changeSets"][ChangeSetName] = {
+				"type": ChangeSetType,
+				"template": self._getTemplate(TemplateURL),
+				"parameters": Parameters,
+				"ready": self.aws.clock.time() + self.aws.changeSetDelay,
+				"executed": False
+			}
+
+	def describe_change_set(self, StackName, ChangeSetName, NextToken=None):
+		self.aws.record("cloudformation", "describe_change_set")
+		changeSet = self._getChangeSet(StackName, ChangeSetName)
+		stack = self._getStack(StackName)
+
+		# Check if the change set is ready
+		if self.aws.clock.time() < changeSet["ready"]:
+			return {"Status": "CREATE_IN_PROGRESS", "ExecutionStatus": "UNAVAILABLE", "Changes": []}
+
+		# Check if there are changes
+		changes = self._getChanges(stack, changeSet["template"], changeSet["parameters"])
+		if len(changes) == 0 and changeSet["type"] == "UPDATE":
+			return {"Status": "FAILED", "StatusReason": "The submitted information didn't contain changes. Submit different information to create a change set.", "ExecutionStatus": "UNAVAILABLE", "Changes": []}
+
+		return {"Status": "CREATE_COMPLETE", "ExecutionStatus": "EXECUTE_COMPLETE" if changeSet["executed"] is True else "AVAILABLE", "Changes": changes}
+
+	def execute_change_set(self, ChangeSetName, StackName, ClientRequestToken=None):
+		self.aws.record("cloudformation", "execute_change_set")
+
+		with self.aws.lock:
+			stack = self._getStack(StackName)
+			changeSet = self._getChangeSet(StackName, ChangeSetName)
+			changeSet["executed"] = True
+			stack.pop("status", None)
+			self._change(StackName, stack, changeSet["type"], changeSet["template"], changeSet["parameters"], ClientRequestToken)
+
+	def delete_change_set(self, StackName, ChangeSetName):
+		self.aws.record("cloudformation", "delete_change_set")
+		with self.aws.lock:
+			self._getStack(StackName)["changeSets"].pop(ChangeSetName, None)
+
+	def _change(self, stackName, stack, action, template, parameters, token=None):
+		""" Create or update a stack, the events happen in virtual time
+		"""
+		# Get the resources which change
+		changes = self._getChanges(stack, template, parameters)
+		startTime = self.aws.clock.time()
+
+		# The stack starts changing
+		self._addEvent(stack, stackName, stackName, "AWS::CloudFormation::Stack", "%s_IN_PROGRESS" % action, startTime, token)
+
+		# The resources change in groups
+		endTime = startTime + 1
+		for index, change in enumerate(changes):
+			resourceChange = change["ResourceChange"]
+			status = {"Add": "CREATE", "Modify": "UPDATE", "Remove": "DELETE"}[resourceChange["Action"]]
+			completeTime = startTime + 1 + self.aws.resourceDelay * (1 + index // FakeAWS.PARALLEL_RESOURCES)
+
+			self._addEvent(stack, stackName, resourceChange["LogicalResourceId"], resourceChange["ResourceType"], "%s_IN_PROGRESS" % status, startTime + 1, token)
+			self._addEvent(stack, stackName, resourceChange["LogicalResourceId"], resourceChange["ResourceType"], "%s_COMPLETE" % status, completeTime, token)
+			endTime = max(endTime, completeTime)
+
+		# The stack is done
+		if action == "UPDATE":
+			self._addEvent(stack, stackName, stackName, "AWS::CloudFormation::Stack", "UPDATE_COMPLETE_CLEANUP_IN_PROGRESS", endTime + 1, token)
+			endTime += 1
+		self._addEvent(stack, stackName, stackName, "AWS::CloudFormation::Stack", "%s_COMPLETE" % action, endTime + 1, token)
+
+		# Remember the new template
+		stack["template"] = template
+		stack["parameters"] = parameters
+
+	def _addEvent(self, stack, stackName, logicalId, resourceType, status, timestamp, token=None):
+		""" Add an event to a stack
+		"""
+		self.aws.eventCount += 1
+		stack["events"].append({
+			"EventId": "event-%i" % self.aws.eventCount,
+			"StackName": stackName,
+			"LogicalResourceId": logicalId,
+			"ResourceType": resourceType,
+			"ResourceStatus": status,
+			"Timestamp": timestamp,
+			"ClientRequestToken": token
+		})
+
+	def _getChanges(self, stack, template, parameters):
+		""" Compare a stack with a new template and parameters
+
+			Returns list with the changes, like describe_change_set
+		"""
+		oldResources = stack["template"].get("Resources", {})
+		newResources = template.get("Resources", {})
+
+		# Get the parameters which changed
+		oldParameters = dict((parameter["ParameterKey"], parameter["ParameterValue"]) for parameter in stack["parameters"])
+		newParameters = dict((parameter["ParameterKey"], parameter["ParameterValue"]) for parameter in parameters)
+		changedParameters = [name for name in set(oldParameters) | set(newParameters) if oldParameters.get(name) != newParameters.get(name)]
+
+		changes = []
+		for logicalId in sorted(set(oldResources) | set(newResources)):
+			# Check what happens with the resource
+			if logicalId not in oldResources:
+				action = "Add"
+			elif logicalId not in newResources:
+				action = "Remove"
+			elif oldResources[logicalId] != newResources[logicalId] or any(json.dumps({"Ref": name}) in json.dumps(newResources[logicalId]) for name in changedParameters):
+				action = "Modify"
+			else:
+				continue
+
+			resource = newResources.get(logicalId, oldResources.get(logicalId))
+			changes.append({"Type": "Resource", "ResourceChange": {
+				"Action": action,
+				"LogicalResourceId": logicalId,
+				"ResourceType": resource.get("Type", ""),
+				"Replacement": "False",
+				"Details": []
+			}})
+
+		return changes
+
+	def _getTemplate(self, templateUrl):
+		""" Get a template from the local S3
+
+			Returns dict with the template
+		"""
+		# Get the bucket and the key from https://<bucket>.s3.<region>.amazonaws.com/<key>
+		host, key = templateUrl.split("://", 1)[1].split("/", 1)
+		return json.loads(self.aws.getObject(host.split(".s3.", 1)[0], key).decode("utf-8"))
+
+	def _getStack(self, stackName):
+		""" Get a stack, like CloudFormation fails when it does not exist
+		"""
+		with self.aws.lock:
+			if stackName not in self.aws.stacks:
+				raise self._getError("ValidationError", "Stack with id %s does not exist" % stackName)
+			return self.aws.stacks[stackName]
+
+	def _getChangeSet(self, stackName, changeSetName):
+		""" Get a change set of a stack
+		"""
+		changeSets = self._getStack(stackName)["changeSets"]
+		if changeSetName not in changeSets:
+			raise self._getError("ChangeSetNotFound", "ChangeSet [%s] does not exist" % changeSetName)
+		return changeSets[changeSetName]
+
+	def _getStatus(self, stack):
+		""" Get the status of a stack at the virtual time
+		"""
+		for event in reversed(stack["events"]):
+			if event["ResourceType"] == "AWS::CloudFormation::Stack" and event["Timestamp"] <= self.aws.clock.time():
+				return event["ResourceStatus"]
+		return stack.get("status", "REVIEW_IN_PROGRESS")
+
+	def _getError(self, code, message):
+		""" Create an error like boto3 raises
+		"""
+		return botocore.exceptions.ClientError({"Error": {"Code": code, "Message": message}}, "CloudFormation")
+
+
+class FakeSession(object):
+	""" A boto3 session which creates the local clients
+	"""
+
+	def __init__(self, aws):
+		self.aws = aws
+
+	def client(self, resourceType, region_name=None):
+		return self.aws.client(resourceType, region_name)
+
+
+class DeployHarness(object):
+	# The profile, bucket, region and stack of the project
+	PROFILE = "pete-harness"
+	BUCKET = "pete-harness-deployments"
+	REGION = "eu-west-1"
+	STACK_NAME = "PeteHarness"
+
+	# Time per scenario which is slower than the baseline times this factor is a regression
+	THRESHOLD = 1.5
+
+	def __init__(self, location, resources=10, files=200, resourceDelay=10.0, changeSetDelay=5.0, verbose=False):
+		""" Create the harness
+
+			Parameters:
+				location: The folder for the project and the home directory
+				resources: Number of resources in the template
+				files: Number of source files in the project
+				resourceDelay: Number of virtual seconds CloudFormation takes per resource
+				changeSetDelay: Number of virtual seconds CloudFormation takes to create a change set
+				verbose: Show the output of pete
+		"""
+		self.location = location
+		self.resources = resources
+		self.files = files
+		self.verbose = verbose
+
+		# Create the local AWS
+		self.clock = VirtualClock()
+		self.aws = FakeAWS(self.clock, resourceDelay=resourceDelay, changeSetDelay=changeSetDelay)
+
+		# The scenarios, in order, every scenario starts from the state of the one before
+		self.scenarios = [
+			("create", "Deploy a new stack", None),
+			("unchanged", "Deploy again without changes", None),
+			("update-code", "Change a source file", self._changeCode),
+			("update-template", "Add a resource to the template", self._changeTemplate)
+		]
+
+	def run(self):
+		""" Run all the scenarios
+
+			Returns dict with the results per scenario
+		"""
+		# Remember the environment
+		workingDir = os.getcwd()
+		environment = dict(os.environ)
+
+		try:
+			# Create the project, with its own home directory so the caches and the global config are empty
+			projectPath = self._createProject()
+			os.environ["HOME"] = os.path.join(self.location, "home")
+			os.environ.pop("VIRTUAL_ENV", None)
+			os.chdir(projectPath)
+
+			# Use the local AWS and the virtual clock
+			BotoTool._clients = {}
+			BotoTool._sessions = {BotoTool._getProfileKey(self.PROFILE): FakeSession(self.aws)}
+			StackWaiter.setClock(sleep=self.clock.sleep, clock=self.clock.time)
+
+			results = {}
+			for name, description, change in self.scenarios:
+				# Change the project
+				if change is not None:
+					change()
+
+				results[name] = self._runScenario(name)
+
+			return results
+
+		finally:
+			# Restore the environment
+			os.chdir(workingDir)
+			os.environ.clear()
+			os.environ.update(environment)
+			BotoTool._clients = {}
+			BotoTool._sessions = {}
+			StackWaiter.setClock()
+
+	def _runScenario(self, name):
+		""" Deploy the project once
+
+			Returns dict with the result
+		"""
+		# Reset the counters
+		with self.aws.lock:
+			self.aws.calls.clear()
+		waited = self.clock.waited
+		sleeps = self.clock.sleeps
+		TimingTool.start()
+
+		# Deploy, the output of pete is only shown when it fails or in verbose mode
+		output = io.StringIO()
+		startTime = time.perf_counter()
+		try:
+			with contextlib.redirect_stdout(sys.stdout if self.verbose is True else output):
+				DeploymentAction().start(production=False, matrix=False)
+			success = True
+		except SystemExit as e:
+			success = e.code in [None, 0]
+		duration = time.perf_counter() - startTime
+
+		# Show why it failed
+		if success is False and self.verbose is False:
+			print(output.getvalue())
+
+		return {
+			"success": success,
+			"seconds": duration,
+			"virtualSeconds": self.clock.waited - waited,
+			"sleeps": self.clock.sleeps - sleeps,
+			"calls": dict(sorted(self.aws.calls.items())),
+			"phases": dict((phaseName, phase["seconds"]) for phaseName, phase in TimingTool.getSummary()["totals"].items())
+		}
+
+	def _createProject(self):
+		""" Create the project and its configuration
+
+			Returns path to the project
+		"""
+		path = os.path.join(self.location, "project")
+
+		# Create the configuration
+		os.makedirs(os.path.join(path, ".pete"))
+		os.makedirs(os.path.join(self.location, "home"))
+		self._write(os.path.join(path, ".pete", "configuration"), json.dumps({
+			"stack-name": self.STACK_NAME,
+			"dev-profile": self.PROFILE,
+			"dev-bucket": self.BUCKET,
+			"dev-region": self.REGION
+		}))
+
+		# Create the source files
+		for i in range(self.files):
+			self._write(os.path.join(path, "src", "module%i" % (i % 20), "file%i.py" % i), "def handler%i(event, context):\n\treturn %i\n" % (i, i) * 20)
+
+		# Create the template
+		self._write(os.path.join(path, "template.yaml"), self._getTemplate(self.resources))
+
+		return path
+
+	def _changeCode(self):
+		""" Change a source file, so a new artifact is built
+		"""
+		self._write(os.path.join("src", "module0", "file0.py"), "def handler(event, context):\n\treturn 'changed'\n")
+
+	def _changeTemplate(self):
+		""" Add a resource to the template
+		"""
+		self._write("template.yaml", self._getTemplate(self.resources + 1))
+
+	def _getTemplate(self, resources):
+		""" Create a template with a function and queues
+
+			Returns the YAML template
+		"""
+		lines = [
+			"Resources:",
+			"  Function:",
+			"    Type: AWS::Lambda::Function",
+			"    Properties:",
+			"      Handler: src/module0/file0.handler",
+			"      Runtime: python3.9",
+			"      Code:",
+			"        S3Bucket: !Ref deploymentBucket",
+			"        S3Key: !Ref s3FileName"
+		]
+		for i in range(resources - 1):
+			lines.extend([
+				"  Queue%i:" % i,
+				"    Type: AWS::SQS::Queue",
+				"    Properties:",
+				"      QueueName: !Sub \"${stackName}-queue-%i\"" % i
+			])
+
+		return "\n".join(lines) + "\n"
+
+	def _write(self, path, content):
+		""" Write a file
+		"""
+		if os.path.dirname(path) != "":
+			os.makedirs(os.path.dirname(path), exist_ok=True)
+		f = open(path, "w")
+		f.write(content)
+		f.close()
+
+	@classmethod
+	def compare(cls, results, baseline, threshold=None):
+		""" Compare the results with a baseline
+
+			Returns list with the differences
+		"""
+		if threshold is None:
+			threshold = cls.THRESHOLD
+
+		differences = []
+		for name, result in results.items():
+			# Check if the baseline has this scenario
+			baselineResult = baseline.get(name)
+			if baselineResult is None:
+				continue
+
+			# The AWS calls should not change
+			for call in sorted(set(result["calls"]) | set(baselineResult["calls"])):
+				if result["calls"].get(call, 0) != baselineResult["calls"].get(call, 0):
+					differences.append("%s: %s was called %i times, %i in the baseline" % (name, call, result["calls"].get(call, 0), baselineResult["calls"].get(call, 0)))
+
+			# The virtual waiting time should not change
+			if abs(result["virtualSeconds"] - baselineResult["virtualSeconds"]) > 0.001:
+				differences.append("%s: waited %.1f virtual seconds, %.1f in the baseline" % (name, result["virtualSeconds"], baselineResult["virtualSeconds"]))
+
+			# Check the time
+			if baselineResult["seconds"] > 0 and result["seconds"] / baselineResult["seconds"] > threshold:
+				differences.append("%s: took %.3fs, %.3fs in the baseline" % (name, result["seconds"], baselineResult["seconds"]))
+
+		return differences
+
+
+def main():
+	""" Run the harness
+	"""
+	# Create the arguments
+	parser = argparse.ArgumentParser(description="Run the CloudFormation deployment of pete against local stand-ins of S3 and CloudFormation")
+	parser.add_argument("--resources", help="Number of resources in the template", type=int, default=10)
+	parser.add_argument("--files", help="Number of source files in the project", type=int, default=200)
+	parser.add_argument("--resource-delay", help="Number of virtual seconds CloudFormation takes per resource", type=float, default=10.0)
+	parser.add_argument("--change-set-delay", help="Number of virtual seconds CloudFormation takes to create a change set", type=float, default=5.0)
+	parser.add_argument("--verbose", help="Show the output of pete", action="store_true")
+	parser.add_argument("--json", help="Save the results to this path")
+	parser.add_argument("--baseline", help="Path to the baseline", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "deploy-baseline.json"))
+	parser.add_argument("--save", help="Save the results as the baseline", action="store_true")
+	parser.add_argument("--threshold", help="Scenarios slower than the baseline times this factor fail", type=float, default=DeployHarness.THRESHOLD)
+	args = parser.parse_args()
+
+	# Run the scenarios in a temporary folder
+	location = tempfile.mkdtemp(prefix="pete-harness-")
+	try:
+		harness = DeployHarness(location, resources=args.resources, files=args.files, resourceDelay=args.resource_delay, changeSetDelay=args.change_set_delay, verbose=args.verbose)
+		results = harness.run()
+	finally:
+		shutil.rmtree(location, ignore_errors=True)
+
+	# Show the results
+	for name, description, change in harness.scenarios:
+		result = results[name]
+		print("%s: %s%s" % (name, description, "" if result["success"] is True else " (FAILED)"))
+		print("  %.3fs of pete, %.0f virtual seconds waited in %i polls, %i AWS calls" % (result["seconds"], result["virtualSeconds"], result["sleeps"], sum(result["calls"].values())))
+		print("  calls:  %s" % ", ".join("%s %i" % (call, count) for call, count in result["calls"].items()))
+		print("  phases: %s" % ", ".join("%s %.3fs" % (phaseName, seconds) for phaseName, seconds in result["phases"].items()))
+
+	# Check if all the scenarios succeeded
+	if any(result["success"] is False for result in results.values()):
+		return 1
+
+	# Save the results
+	settings = {"resources": args.resources, "files": args.files, "resourceDelay": args.resource_delay, "changeSetDelay": args.change_set_delay}
+	if args.json is not None:
+		f = open(args.json, "w")
+		f.write(json.dumps({"settings": settings, "results": results}, indent=4))
+		f.close()
+
+	# Check if we should save the baseline
+	if args.save is True:
+		f = open(args.baseline, "w")
+		f.write(json.dumps({"settings": settings, "results": results}, indent=4))
+		f.close()
+		print("Saved the baseline to %s" % args.baseline)
+		return 0
+
+	# Check if there is a baseline
+	if os.path.exists(args.baseline) is False:
+		print("There is no baseline yet, create it with --save")
+		return 0
+
+	# Read the baseline
+	f = open(args.baseline, "r")
+	baseline = json.loads(f.read())
+	f.close()
+
+	# Check if the results can be compared
+	if baseline.get("settings") != settings:
+		print("The baseline was created with other settings, it can not be compared")
+		return 1
+
+	# Compare the results
+	differences = DeployHarness.compare(results, baseline["results"], args.threshold)
+	for difference in differences:
+		print(difference)
+	if len(differences) > 0:
+		return 1
+
+	print("The results match the baseline")
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,77 @@
+""" Check that starting pete stays fast
+
+	Importing tpd_pete.pete, which runs before argparse, should not load the heavy dependencies and
+	should stay within the time budget. The import runs in a new interpreter, so nothing is imported yet.
+
+	Usage:
+		python benchmarks/imports.py
+		python benchmarks/imports.py --budget 0.2 --repeat 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# The modules which should only be imported when their mode is used
+HEAVY_MODULES = ["boto3", "botocore", "halo", "PyInquirer", "cfn_tools", "termcolor"]
+
+# Import pete and report the time and the heavy modules
+CHECK_CODE = """
+import json
+import sys
+import time
+
+startTime = time.perf_counter()
+import tpd_pete.pete
+duration = time.perf_counter() - startTime
+
+print(json.dumps({"seconds": duration, "modules": [name for name in %r if name in sys.modules]}))
+"""
+
+
+def measure():
+	""" Import pete in a new interpreter
+
+		Returns dict with the seconds and the heavy modules which were imported
+	"""
+	# Use the pete in this repository
+	environment = dict(os.environ)
+	environment["PYTHONPATH"] = os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] + ([environment["PYTHONPATH"]] if environment.get("PYTHONPATH") else []))
+
+	output = subprocess.check_output([sys.executable, "-c", CHECK_CODE % HEAVY_MODULES], env=environment)
+	return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def main():
+	""" Run the check
+	"""
+	# Create the arguments
+	parser = argparse.ArgumentParser(description="Check that starting pete stays fast")
+	parser.add_argument("--budget", help="Maximal number of seconds to import tpd_pete.pete", type=float, default=0.1)
+	parser.add_argument("--repeat", help="Number of imports, the fastest one counts", type=int, default=5)
+	args = parser.parse_args()
+
+	# Import pete a few times
+	results = [measure() for i in range(args.repeat)]
+	seconds = min(result["seconds"] for result in results)
+	modules = sorted(set(name for result in results for name in result["modules"]))
+
+	print("Importing tpd_pete.pete takes %.1f ms, the budget is %.1f ms" % (seconds * 1000, args.budget * 1000))
+
+	# Check the heavy modules
+	failed = False
+	if len(modules) > 0:
+		print("These modules should not be imported before the mode is used: %s" % ", ".join(modules))
+		failed = True
+
+	# Check the budget
+	if seconds > args.budget:
+		print("Importing tpd_pete.pete is over the budget")
+		failed = True
+
+	return 1 if failed is True else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -0,0 +1,398 @@
+""" Benchmark the local packaging steps of pete on synthetic projects
+
+	Usage:
+		python benchmarks/packaging.py                   Run all the shapes and compare with the baseline
+		python benchmarks/packaging.py --save            Run all the shapes and save them as the baseline
+		python benchmarks/packaging.py --shape small-files --scale 0.1 --repeat 5
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# Use the pete in this repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tpd_pete.tools.archive import ArchiveTool  # noqa: E402
+from tpd_pete.tools.cache import CacheTool  # noqa: E402
+from tpd_pete.tools.ignore import IgnoreMatcher  # noqa: E402
+from tpd_pete.tools.slim import SlimTool  # noqa: E402
+from tpd_pete.tools.staging import StagingTool  # noqa: E402
+
+
+class ProjectGenerator(object):
+	# Words for the text files, so they compress like source code
+	WORDS = [
+		"def", "return", "self", "import", "class", "function", "const", "value", "None", "true",
+		"false", "module", "exports", "require", "if", "else", "for", "in", "while", "object",
+		"string", "number", "length", "index", "result", "data", "config", "handler", "event", "context"
+	]
+
+	# The shapes of the projects, the sizes are at scale 1
+	SHAPES = {
+		"small-files": "Many small source files in a flat project",
+		"large-files": "A few large files, half of them already compressed",
+		"node-modules": "A small project with a deep node_modules tree",
+		"site-packages": "A small project with vendored Python packages"
+	}
+
+	def __init__(self, location, scale=1.0, seed=1):
+		""" Create the generator
+
+			Parameters:
+				location: The folder to create the project in
+				scale: Multiply the number and the size of the files with this factor
+				seed: Seed of the random content, the same seed creates the same project
+		"""
+		self.location = location
+		self.scale = scale
+		self.random = random.Random(seed)
+
+	def create(self, shape):
+		""" Create a project
+
+			Returns the path to the project
+		"""
+		# Check if the shape exists
+		if shape not in self.SHAPES:
+			raise Exception("Unknown shape %s, choose from %s" % (shape, ", ".join(self.SHAPES)))
+
+		# Create the folder
+		path = os.path.join(self.location, shape)
+		os.makedirs(path)
+
+		# Create the files
+		getattr(self, "_create%s" % shape.title().replace("-", ""))(path)
+
+		return path
+
+	def _createSmallFiles(self, path):
+		""" Create many small source files
+		"""
+		for i in range(self._count(20000)):
+			self._writeText(os.path.join(path, "src", "module%i" % (i % 200), "file%i.py" % i), self.random.randint(200, 4000))
+
+	def _createLargeFiles(self, path):
+		""" Create a few large files, half of them already compressed
+		"""
+		for i in range(4):
+			self._writeText(os.path.join(path, "data", "table%i.csv" % i), self._size(64 * 1024 * 1024))
+			self._writeRandom(os.path.join(path, "assets", "video%i.mp4" % i), self._size(64 * 1024 * 1024))
+
+	def _createNodeModules(self, path):
+		""" Create a small project with a deep node_modules tree
+		"""
+		# The project itself
+		self._createProject(path)
+		self._writeText(os.path.join(path, "package.json"), 500)
+
+		# The packages, with packages nested in packages
+		for i in range(self._count(400)):
+			packagePath = os.path.join(path, "node_modules")
+			for depth in range(self.random.randint(1, 6)):
+				packagePath = os.path.join(packagePath, "package%i-%i" % (i, depth), "node_modules")
+			packagePath = os.path.dirname(packagePath)
+
+			# The files of the package
+			self._writeText(os.path.join(packagePath, "package.json"), 800)
+			self._writeText(os.path.join(packagePath, "README.md"), 3000)
+			for j in range(self.random.randint(5, 40)):
+				self._writeText(os.path.join(packagePath, "lib", "file%i.js" % j), self.random.randint(500, 20000))
+
+	def _createSitePackages(self, path):
+		""" Create a small project with vendored Python packages
+		"""
+		# The project itself
+		self._createProject(path)
+		self._writeText(os.path.join(path, "requirements.txt"), 300)
+
+		# The packages, with files Lambda does not need
+		packagesPath = os.path.join(path, "site-packages")
+		for name in ["boto3", "botocore"] + ["package%i" % i for i in range(self._count(60))]:
+			for j in range(self.random.randint(10, 80)):
+				self._writeText(os.path.join(packagesPath, name, "module%i.py" % j), self.random.randint(500, 30000))
+				self._writeRandom(os.path.join(packagesPath, name, "__pycache__", "module%i.cpython-39.pyc" % j), self.random.randint(500, 20000))
+			for j in range(self.random.randint(0, 20)):
+				self._writeText(os.path.join(packagesPath, name, "tests", "test_%i.py" % j), self.random.randint(500, 5000))
+			self._writeText(os.path.join(packagesPath, "%s-1.0.0.dist-info" % name, "RECORD"), 2000)
+
+			# Some packages have a shared library
+			if self.random.random() < 0.2:
+				self._writeRandom(os.path.join(packagesPath, name, "_speedups.so"), self.random.randint(100000, 2000000))
+
+	def _createProject(self, path):
+		""" Create the source files of a small project
+		"""
+		for i in range(self._count(50)):
+			self._writeText(os.path.join(path, "src", "file%i.py" % i), self.random.randint(500, 8000))
+		self._writeText(os.path.join(path, ".git", "HEAD"), 100)
+
+	def _writeText(self, path, size):
+		""" Write a text file of about a number of bytes
+		"""
+		# Create the text
+		words = []
+		length = 0
+		while length < size:
+			word = self.random.choice(self.WORDS)
+			words.append(word)
+			length += len(word) + 1
+
+		# Write the file
+		self._write(path, " ".join(words)[:size].encode("utf-8"))
+
+	def _writeRandom(self, path, size):
+		""" Write a file with random bytes, which does not compress
+		"""
+		self._write(path, self.random.getrandbits(size * 8).to_bytes(size, "little") if size > 0 else b"")
+
+	def _write(self, path, data):
+		""" Write a file
+		"""
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+		f = open(path, "wb")
+		f.write(data)
+		f.close()
+
+	def _count(self, number):
+		""" Scale a number of files
+		"""
+		return max(1, int(number * self.scale))
+
+	def _size(self, size):
+		""" Scale a file size
+		"""
+		return max(1, int(size * self.scale))
+
+
+class PackagingBenchmark(object):
+	# Results which are slower than the baseline times this factor are regressions
+	THRESHOLD = 1.25
+
+	def __init__(self, location, repeat=3, workers=None):
+		""" Create the benchmark
+
+			Parameters:
+				location: The folder for the staging directories and zips
+				repeat: Number of runs per step, the fastest run counts
+				workers: Number of compression processes, defaults to the number of cores
+		"""
+		self.location = location
+		self.repeat = repeat
+		self.workers = workers if workers is not None else (os.cpu_count() or 1)
+
+	def run(self, shape, path):
+		""" Run all the steps on a project
+
+			Returns dict with the results per step
+		"""
+		results = {}
+
+		# Walk the project, like the staging does, the dependencies are staged separately
+		extraPatterns = {"node-modules": ["/node_modules/"], "site-packages": ["/site-packages/"]}.get(shape)
+		matcher = IgnoreMatcher.fromFile(os.path.join(path, ".peteignore"), extraPatterns=extraPatterns)
+		files = self._measure(results, "walk", lambda: StagingTool.listFiles(path, folderLinks=True, matcher=matcher))
+
+		# Stage the project with clones and with copies
+		self._measure(results, "stage-link", lambda destination: StagingTool.stage(files, destination, link=True), files, staging=True)
+		self._measure(results, "stage-copy", lambda destination: StagingTool.stage(files, destination, link=False), files, staging=True)
+
+		# Stage the dependencies, like _checkDependencies does
+		if shape == "node-modules":
+			dependencies = StagingTool.listFiles(os.path.join(path, "node_modules"), folderLinks=True, matcher=IgnoreMatcher([]))
+			self._measure(results, "dependencies", lambda destination: StagingTool.stageFolder(os.path.join(path, "node_modules"), destination, link=False), dependencies, staging=True)
+		if shape == "site-packages":
+			packagesPath = os.path.join(path, "site-packages")
+			dependencies = self._measure(results, "slim-walk", lambda: SlimTool.listFiles(packagesPath)[0])
+			self._measure(results, "dependencies", lambda destination: StagingTool.stage(dependencies, destination, link=False), dependencies, staging=True)
+			files = files + dependencies
+
+		# Hash the content, like the build cache does
+		self._measure(results, "hash", lambda: CacheTool.fingerprint(files, lockFiles=[]), files)
+
+		# Compress the content on one core and on all the cores
+		self._measure(results, "zip-1", lambda destination: self._zip(files, destination, 1), files, staging=True)
+		if self.workers > 1:
+			self._measure(results, "zip-%i" % self.workers, lambda destination: self._zip(files, destination, self.workers), files, staging=True)
+
+		return results
+
+	def _measure(self, results, name, function, files=None, staging=False):
+		""" Measure a step and remember the fastest run
+
+			Parameters:
+				results: The dict to add the result to
+				name: Name of the step
+				function: The step, it receives a new empty folder when staging is True
+				files: The files the step handles, to calculate the throughput
+				staging: Give the step a new empty folder for every run
+
+			Returns the value of the last run
+		"""
+		seconds = None
+		for i in range(self.repeat):
+			# Create a new folder
+			destination = tempfile.mkdtemp(dir=self.location) if staging is True else None
+
+			# Run the step
+			startTime = time.perf_counter()
+			value = function(destination) if staging is True else function()
+			duration = time.perf_counter() - startTime
+
+			# Remove the folder
+			if destination is not None:
+				shutil.rmtree(destination)
+
+			# Remember the fastest run
+			if seconds is None or duration < seconds:
+				seconds = duration
+
+		# Count the files and bytes
+		if files is None:
+			files = value
+		size = sum(os.path.getsize(path) for path, _ in files if os.path.isfile(path) is True)
+
+		results[name] = {
+			"seconds": seconds,
+			"files": len(files),
+			"bytes": size,
+			"filesPerSecond": len(files) / seconds if seconds > 0 else 0,
+			"mbPerSecond": size / 1024 / 1024 / seconds if seconds > 0 else 0
+		}
+
+		return value
+
+	def _zip(self, files, destination, workers):
+		""" Create a zip of the files
+
+			Returns dict with the statistics
+		"""
+		f = open(os.path.join(destination, "content.zip"), "wb")
+		try:
+			return ArchiveTool.createZip(files, f, workers=workers)
+		finally:
+			f.close()
+
+	@classmethod
+	def getMachine(cls):
+		""" Get a description of the machine, results of different machines can not be compared
+
+			Returns dict
+		"""
+		return {
+			"python": platform.python_version(),
+			"system": platform.system(),
+			"machine": platform.machine(),
+			"cpus": os.cpu_count()
+		}
+
+	@classmethod
+	def compare(cls, results, baseline, threshold=None):
+		""" Compare the results with a baseline
+
+			Returns list with tuples (shape, step, seconds, baseline seconds, ratio, is regression)
+		"""
+		if threshold is None:
+			threshold = cls.THRESHOLD
+
+		comparison = []
+		for shape, steps in results.items():
+			for step, result in steps.items():
+				# Check if the baseline has this step
+				baselineResult = baseline.get(shape, {}).get(step)
+				if baselineResult is None or baselineResult["seconds"] <= 0:
+					continue
+
+				ratio = result["seconds"] / baselineResult["seconds"]
+				comparison.append((shape, step, result["seconds"], baselineResult["seconds"], ratio, ratio > threshold))
+
+		return comparison
+
+
+def main():
+	""" Run the benchmarks
+	"""
+	# Create the arguments
+	parser = argparse.ArgumentParser(description="Benchmark the local packaging steps of pete on synthetic projects")
+	parser.add_argument("--shape", help="Run only these shapes", choices=list(ProjectGenerator.SHAPES), action="append")
+	parser.add_argument("--scale", help="Multiply the number and the size of the files with this factor", type=float, default=1.0)
+	parser.add_argument("--repeat", help="Number of runs per step, the fastest run counts", type=int, default=3)
+	parser.add_argument("--workers", help="Number of compression processes", type=int)
+	parser.add_argument("--directory", help="Folder to create the projects in, defaults to a temporary folder")
+	parser.add_argument("--baseline", help="Path to the baseline", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json"))
+	parser.add_argument("--save", help="Save the results as the baseline", action="store_true")
+	parser.add_argument("--threshold", help="Steps slower than the baseline times this factor fail", type=float, default=PackagingBenchmark.THRESHOLD)
+	args = parser.parse_args()
+
+	# Create the folder
+	location = tempfile.mkdtemp(prefix="pete-benchmark-", dir=args.directory)
+
+	try:
+		generator = ProjectGenerator(location, scale=args.scale)
+		benchmark = PackagingBenchmark(location, repeat=args.repeat, workers=args.workers)
+
+		# Run the shapes
+		results = {}
+		for shape in (args.shape or list(ProjectGenerator.SHAPES)):
+			print("%s: %s" % (shape, ProjectGenerator.SHAPES[shape]))
+			path = generator.create(shape)
+			results[shape] = benchmark.run(shape, path)
+
+			# Show the results
+			for step, result in results[shape].items():
+				print("  %-14s %8.3fs %8i files %10.0f files/s %8.1f MB/s" % (step, result["seconds"], result["files"], result["filesPerSecond"], result["mbPerSecond"]))
+
+			# Remove the project
+			shutil.rmtree(path)
+
+	finally:
+		shutil.rmtree(location, ignore_errors=True)
+
+	# Check if we should save the baseline
+	if args.save is True:
+		f = open(args.baseline, "w")
+		f.write(json.dumps({"machine": PackagingBenchmark.getMachine(), "scale": args.scale, "results": results}, indent=4))
+		f.close()
+		print("Saved the baseline to %s" % args.baseline)
+		return 0
+
+	# Check if there is a baseline
+	if os.path.exists(args.baseline) is False:
+		print("There is no baseline yet, create it with --save")
+		return 0
+
+	# Read the baseline
+	f = open(args.baseline, "r")
+	baseline = json.loads(f.read())
+	f.close()
+
+	# Check if the results can be compared
+	if baseline.get("scale") != args.scale:
+		print("The baseline was created with --scale %s, it can not be compared" % baseline.get("scale"))
+		return 1
+	if baseline.get("machine") != PackagingBenchmark.getMachine():
+		print("The baseline was created on another machine or Python version, the comparison is only a hint")
+
+	# Compare the results
+	regressions = 0
+	print("Compared with the baseline:")
+	for shape, step, seconds, baselineSeconds, ratio, isRegression in PackagingBenchmark.compare(results, baseline["results"], args.threshold):
+		print("  %-14s %-14s %8.3fs %8.3fs %6.2fx%s" % (shape, step, seconds, baselineSeconds, ratio, " SLOWER" if isRegression is True else ""))
+		if isRegression is True:
+			regressions += 1
+
+	# Fail when a step got slower
+	if regressions > 0:
+		print("%i steps are more than %.2fx slower than the baseline" % (regressions, args.threshold))
+		return 1
+
+	return 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,14 +1,12 @@
-from .actions.configure import ConfigureAction
-from .actions.create_project import CreateProjectAction
-from .actions.deploymentaction import DeploymentAction
-from .actions.localoverride import SetupLocalOverrideAction
-
-
 class ActionManager(object):
+	""" Start the actions, each action is only imported when it is used
+	"""
+
 	@classmethod
 	def configure(cls):
 		""" Configure TPD Pete
 		"""
+		from .actions.configure import ConfigureAction
 		return ConfigureAction().start()
 
 	@classmethod
@@ -17,12 +15,36 @@ class ActionManager(object):
 		"""
 		# Check if this is the local configuation override action
 		if local is True:
+			from .actions.localoverride import SetupLocalOverrideAction
 			return SetupLocalOverrideAction().start()
 
+		from .actions.create_project import CreateProjectAction
 		return CreateProjectAction().start()
 
 	@classmethod
-	def deploy(cls, production=False):
+	def deploy(cls, production=False, matrix=False):
 		""" Deploy the current project
 		"""
-		return DeploymentAction().start(production=production)
+		from .actions.deploymentaction import DeploymentAction
+		return DeploymentAction().start(production=production, matrix=matrix)
+
+	@classmethod
+	def plan(cls, production=False, matrix=False, discard=False):
+		""" Show what a deployment of the current project would change
+		"""
+		from .actions.planaction import PlanAction
+		return PlanAction().start(production=production, matrix=matrix, discard=discard)
+
+	@classmethod
+	def apply(cls):
+		""" Execute the plan of the current project
+		"""
+		from .actions.applyaction import ApplyAction
+		return ApplyAction().start()
+
+	@classmethod
+	def collectGarbage(cls, production=False, keep=10):
+		""" Remove the old artifacts of the current project
+		"""
+		from .actions.garbagecollection import GarbageCollectionAction
+		return GarbageCollectionAction().start(production=production, keep=keep)
@@ -0,0 +1,17 @@
+import sys
+from termcolor import cprint as print
+
+from .iaction import IAction
+from .deployment.cloudformationdeployment import CloudFormationDeployment
+
+
+class ApplyAction(IAction):
+	""" The apply action
+	"""
+
+	def start(self, **kwargs):
+		""" Execute the change sets of the plan
+		"""
+		print("Applying CloudFormation plan", "blue")
+		if CloudFormationDeployment().startApply(**kwargs) is False:
+			sys.exit(1)
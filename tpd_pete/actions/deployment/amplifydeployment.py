@@ -2,6 +2,8 @@ import subprocess
 
 from halo import Halo
 from termcolor import cprint as print
+
+from ...tools.timing import TimingTool
 from .ideploymentaction import IDeploymentAction
 
 
@@ -23,7 +25,8 @@ class AmplifyDeployment(IDeploymentAction):
 
 		# Send it to AWS Amplify
 		with Halo(text="AWS Amplify deploying") as spinner:
-			status = self._amplifyDeploy()
+			with TimingTool.phase("amplify"):
+				status = self._amplifyDeploy()
 			if status is True:
 				spinner.succeed()
 			else:
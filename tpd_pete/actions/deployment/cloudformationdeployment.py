@@ -2,15 +2,23 @@ import json
 import os
 import sys
 import time
-import zipfile
+from concurrent.futures import ThreadPoolExecutor
 
+import botocore.exceptions
 from halo import Halo
 from PyInquirer import prompt
 from termcolor import cprint as print
 
 from ...tools.configuration import ConfigurationTool, ConfigKey, ConfigType
 from ...tools.template import TemplateTool
-from ...tools.boto import BotoTool
+from ...tools.timing import TimingTool
+from ...tools.archive import ArchiveTool, CompressionPolicy
+from ...tools.boto import BotoTool, UploadProgress
+from ...tools.changeset import ChangeSetTool
+from ...tools.cache import CacheTool
+from ...tools.scheduler import StageScheduler
+from ...tools.stackwaiter import StackWaiter
+from ...tools.staging import StagingTool
 from .ideploymentaction import IDeploymentAction, EnvironmentEnum
 
 
@@ -18,12 +26,48 @@ class CloudFormationDeployment(IDeploymentAction):
 	""" Deployment through AWS CloudFormation
 	"""
 
+	# Number of seconds the garbage collection keeps every uploaded artifact and template
+	GARBAGE_MIN_AGE = 24 * 60 * 60
+
+	def __init__(self):
+		""" Init the deployment
+		"""
+		# Initialize the parent
+		super().__init__()
+
+		# The matrix target, it overrides the profile, bucket and region of the environment
+		self.target = None
+
+		# Directory of the deployment template, defaults to the staging directory
+		self.templateLocation = None
+
+		# The waiter of the last stack change
+		self.stackWaiter = None
+
+		# The stack of a project with multiple stacks
+		self.stack = None
+
+		# If the stack already ran this template with these parameters
+		self.unchanged = False
+
+		# If the stack was created by a change set of a plan, but never deployed
+		self.stackInReview = False
+
+		# If the change set of a plan was executed, or can not be executed anymore
+		self.changeSetDone = False
+
 	def start(self, **kwargs):
 		""" Start the deployment
+
+			Returns boolean
 		"""
 		# Get the configs
 		ConfigurationTool.readConfig()
 
+		# Check if the project has multiple stacks
+		if ConfigurationTool.getConfig(ConfigKey.STACKS) is not None:
+			return self.startStacks(**kwargs)
+
 		# Check if there is an template
 		if os.path.exists("template.yaml") is False:
 			raise Exception("Cant find CloudFormation template: 'template.yaml'")
@@ -32,47 +76,788 @@ class CloudFormationDeployment(IDeploymentAction):
 		if kwargs['production'] is True:
 			self.environment = EnvironmentEnum.PRODUCTION
 
-		# Create a temporary directory
-		with Halo(text="Creating environment") as spinner:
-			self._createTempDir()
-			spinner.succeed()
+		# Check the template first, mistakes are found before anything is built
+		self.templateLocation = self._createTempPath()
+		templates = self._renderTemplates({"template": self})
+		if templates is None:
+			return False
 
-		# Create a new temporary template
-		with Halo(text="Creating template") as spinner:
-			try:
-				parameters = self._createTemporaryTemplate()
-			except Exception as e:
-				spinner.fail()
-				print(e, "red")
-				return False
-			else:
-				spinner.succeed()
+		# Prepare the deployment, the independent stages run at the same time
+		scheduler = StageScheduler()
+		scheduler.add("environment", self._createTempDir)
+		scheduler.add("dependencies", self._checkDependencies, dependsOn=["environment"])
+		scheduler.add("stack", self._stackExists)
+
+		results = self._runStages(scheduler)
 
 		# Check if there are other parameters
-		parameters = self._checkParameters(parameters)
+		parameters = self._checkParameters(templates["template"])
+		stackExists = results["stack"]
 
-		# Check the dependencies
-		with Halo(text="Installing dependencies") as spinner:
-			self._checkDependencies()
-			spinner.succeed()
+		# Fingerprint the content, the fingerprint is also the name of the artifact
+		fingerprint = self._fingerprintContent()
+		s3Location = self._getArtifactKey(fingerprint)
 
-		# Zip it all
-		with Halo(text="Zipping content") as spinner:
-			zipName = self._zipContent()
-			spinner.succeed()
+		# Upload the template while the content is uploaded
+		with ThreadPoolExecutor(max_workers=1) as executor:
+			templateUpload = executor.submit(self._uploadTemplate)
 
-		# Upload the zip
-		with Halo(text="Uploading to S3") as spinner:
-			s3Location = self._uploadToS3(zipName)
-			spinner.succeed()
+			# Check if this content is already in the bucket
+			if self._existsInS3(s3Location) is True:
+				with Halo(text="Uploading to S3") as spinner:
+					spinner.succeed("Uploading to S3 (already uploaded)")
+
+			# Check if we should stream the zip straight to S3
+			elif CacheTool.getArtifact(fingerprint) is None and ConfigurationTool.getConfig(ConfigKey.STREAM_UPLOAD) is True:
+				with Halo(text="Zipping and uploading to S3") as spinner:
+					progress = UploadProgress(lambda text: setattr(spinner, "text", "Zipping and uploading to S3: %s" % text))
+					self._streamToS3(s3Location, callback=progress)
+					spinner.succeed(ArchiveTool.getSummary(self.zipStatistics))
+
+			else:
+				# Zip it all
+				zipPath = self._buildArtifact(fingerprint)
+
+				# Upload the zip
+				with Halo(text="Uploading to S3") as spinner:
+					progress = UploadProgress(lambda text: setattr(spinner, "text", "Uploading to S3: %s" % text), totalBytes=os.path.getsize(zipPath))
+					self._uploadToS3(zipPath, s3Location, callback=progress)
+					spinner.succeed("Uploading to S3: %s" % progress.getText())
+
+			# Wait for the template
+			templateUrl = templateUpload.result()
 
 		# Send it to CloudFormation
 		with Halo(text="CloudFormation deploying") as spinner:
-			status = self._cloudformationDeploy(parameters, s3Location)
+			status = self._cloudformationDeploy(
+				parameters,
+				s3Location,
+				stackExists,
+				templateUrl,
+				onUpdate=lambda text: setattr(spinner, "text", "CloudFormation deploying: %s" % text)
+			)
 			if status is True:
-				spinner.succeed()
+				spinner.succeed("CloudFormation deploying (no changes)" if self.unchanged is True else "CloudFormation deploying")
+			else:
+				spinner.fail("CloudFormation deploying failed")
+
+		# Show why the deployment failed
+		if status is False:
+			for failure in self.stackWaiter.failures:
+				print(failure, "red")
+
+		return status
+
+	def startMatrix(self, **kwargs):
+		""" Build once and deploy to all the targets of the matrix at the same time
+
+			Returns boolean
+		"""
+		# Get the configs
+		ConfigurationTool.readConfig()
+
+		# Get the targets and prepare them
+		deployments = self._createMatrixDeployments()
+		prepared = self._prepareTargets(deployments)
+		if prepared is None:
+			return False
+		parameters, stacksExist, s3Location = prepared
+
+		# Send it to CloudFormation, all targets at the same time
+		statuses, errors = self._runTargets(
+			deployments,
+			lambda name, deployment, onUpdate: self._deployTarget(deployment, parameters[name], s3Location, stacksExist[name], onUpdate),
+			"CloudFormation deploying"
+		)
+
+		# Show the result of every target
+		self._showResults(deployments, statuses, errors)
+
+		return all(statuses.values())
+
+	def startPlan(self, **kwargs):
+		""" Build once and create the change sets of the environments, without executing them
+
+			Returns boolean
+		"""
+		# Get the configs
+		ConfigurationTool.readConfig()
+
+		# Remove the change sets of the previous plan
+		self._discardPlan()
+
+		# Get the environment or the targets of the matrix
+		if kwargs.get('matrix') is True:
+			deployments = self._createMatrixDeployments()
+		else:
+			self._checkTemplate()
+			if kwargs['production'] is True:
+				self.environment = EnvironmentEnum.PRODUCTION
+			self.templateLocation = self._createTempPath()
+			deployments = {str(self.environment): self}
+
+		# Prepare the targets
+		prepared = self._prepareTargets(deployments)
+		if prepared is None:
+			return False
+		parameters, stacksExist, s3Location = prepared
+
+		# Create the change sets, all targets at the same time
+		plans, errors = self._runTargets(
+			deployments,
+			lambda name, deployment, onUpdate: self._planTarget(deployment, parameters[name], s3Location, stacksExist[name]),
+			"Creating change sets"
+		)
+
+		# Show the changes of every target
+		for name in deployments:
+			if name in errors:
+				print("%s: failed" % name, "red")
+				print("  %s" % errors[name], "red")
+			elif plans[name] is None:
+				print("%s: no changes" % name, "green")
+			else:
+				print("%s: %s" % (name, ChangeSetTool.getSummary(plans[name]["changes"])), "blue")
+				for text, color in ChangeSetTool.getLines(plans[name]["changes"]):
+					print(text, color)
+
+		# Get the change sets
+		changeSets = [(name, plans[name]) for name in deployments if plans.get(name) is not None]
+
+		# Check if we should remove the change sets
+		if kwargs.get('discard') is True:
+			for name, plan in changeSets:
+				deployments[name]._discardChangeSet(plan["stackName"], plan["changeSetName"], plan["changeSetType"])
+			if len(changeSets) > 0:
+				print("Removed the change sets", "yellow")
+
+		# Save the plan
+		elif len(changeSets) > 0:
+			self._savePlan(deployments, changeSets)
+			print("Use `pete apply` to execute the change sets", "yellow")
+
+		return len(errors) == 0
+
+	def startApply(self, **kwargs):
+		""" Execute the change sets of the plan
+
+			Returns boolean
+		"""
+		# Get the configs
+		ConfigurationTool.readConfig()
+
+		# Get the plan
+		plan = self._readPlan()
+		if plan is None:
+			raise Exception("There is no plan to apply, use `pete plan` first")
+
+		# Create a deployment per target
+		targets = dict((target["name"], target) for target in plan["targets"])
+		deployments = dict((name, self._getPlanDeployment(target)) for name, target in targets.items())
+
+		# Execute the change sets, all targets at the same time
+		statuses, errors = self._runTargets(
+			deployments,
+			lambda name, deployment, onUpdate: deployment._applyChangeSet(targets[name]["stackName"], targets[name]["changeSetName"], onUpdate=onUpdate),
+			"CloudFormation deploying"
+		)
+
+		# Show the result of every target
+		self._showResults(deployments, statuses, errors)
+
+		# Keep the change sets which were not executed, like after throttling, so the plan can be applied again
+		remaining = [targets[name] for name in deployments if deployments[name].changeSetDone is False]
+		if len(remaining) == 0:
+			os.remove(self._getPlanPath())
+		else:
+			plan["targets"] = remaining
+			self._writePlan(plan)
+			print("The change sets of %s were not executed, use `pete apply` to try again" % ", ".join(target["name"] for target in remaining), "yellow")
+
+		return all(statuses.values())
+
+	def startStacks(self, **kwargs):
+		""" Deploy all the stacks of the project, the independent stacks at the same time
+
+			Returns boolean
+		"""
+		# Check if it is the production environment
+		if kwargs['production'] is True:
+			self.environment = EnvironmentEnum.PRODUCTION
+
+		# Create a deployment per stack
+		stacks = self._getStacks()
+		deployments = {}
+		for stack in stacks:
+			deployment = CloudFormationDeployment()
+			deployment.environment = self.environment
+			deployment.stack = stack
+			deployment.templateLocation = self._createTempPath()
+			deployments[stack["name"]] = deployment
+
+		# Check the templates first, mistakes are found before anything is built
+		templates = self._renderTemplates(deployments)
+		if templates is None:
+			return False
+
+		# Prepare the build once, and the stacks of all the stacks
+		scheduler = StageScheduler(maxWorkers=2 + len(deployments))
+		scheduler.add("environment", self._createTempDir)
+		scheduler.add("dependencies", self._checkDependencies, dependsOn=["environment"])
+		for name, deployment in deployments.items():
+			scheduler.add("stack %s" % name, deployment._stackExists)
+
+		results = self._runStages(scheduler)
+
+		# Check if there are other parameters, the outputs of other stacks are filled in later
+		parameters = {}
+		for stack in stacks:
+			templateParameters = templates[stack["name"]]
+			for parameterName in stack["outputs"]:
+				if parameterName not in templateParameters:
+					raise Exception("Stack '%s' has no parameter '%s' to receive an output" % (stack["name"], parameterName))
+				del templateParameters[parameterName]
+			parameters[stack["name"]] = deployments[stack["name"]]._checkParameters(templateParameters)
+
+		# Zip it all, once for all the stacks
+		fingerprint = self._fingerprintContent()
+		s3Location = self._getArtifactKey(fingerprint)
+		zipPath = self._buildArtifact(fingerprint)
+
+		# Get the artifact in the bucket
+		self._distributeArtifact(zipPath, s3Location, list(deployments.values()))
+
+		# Remember the outputs and the progress of the stacks
+		outputs = {}
+		progress = {}
+
+		def onUpdate(name, text):
+			progress[name] = text
+			spinner.text = "CloudFormation deploying: %s" % ", ".join("%s %s" % (stackName, stackText) for stackName, stackText in progress.items())
+
+		def deployStack(stack):
+			# Fill in the outputs of the other stacks
+			stackParameters = dict(parameters[stack["name"]])
+			for parameterName, output in stack["outputs"].items():
+				stackName, outputKey = output.split(".", 1)
+				if outputKey not in outputs[stackName]:
+					raise Exception("Stack '%s' has no output '%s'" % (stackName, outputKey))
+				stackParameters[parameterName] = outputs[stackName][outputKey]
+
+			# Deploy the stack
+			deployment = deployments[stack["name"]]
+			templateUrl = deployment._uploadTemplate()
+			status = deployment._cloudformationDeploy(
+				stackParameters,
+				s3Location,
+				results["stack %s" % stack["name"]],
+				templateUrl,
+				onUpdate=lambda text: onUpdate(stack["name"], text)
+			)
+			if status is False:
+				raise Exception("Deploying stack '%s' failed" % stack["name"])
+
+			# Remember the outputs for the stacks which depend on this one
+			outputs[stack["name"]] = deployment._getStackOutputs()
+			progress.pop(stack["name"], None)
+			return status
+
+		# Deploy the stacks, each stack starts when the stacks it depends on are done
+		scheduler = StageScheduler(maxWorkers=len(deployments))
+		for stack in stacks:
+			scheduler.add(stack["name"], lambda stack=stack: deployStack(stack), dependsOn=stack["depends"])
+
+		with Halo(text="CloudFormation deploying") as spinner:
+			try:
+				scheduler.run()
+			except Exception:
+				spinner.fail("CloudFormation deploying failed at stack: %s" % ", ".join(scheduler.errors.keys()))
 			else:
-				spinner.fail()
+				spinner.succeed("CloudFormation deploying %i stacks" % len(deployments))
+
+		# Show the result of every stack
+		for stack in stacks:
+			name = stack["name"]
+			if name in outputs:
+				print("%s: %s" % (name, "unchanged" if deployments[name].unchanged is True else "deployed"), "green")
+			elif name in scheduler.errors:
+				print("%s: failed" % name, "red")
+				if deployments[name].stackWaiter is not None and len(deployments[name].stackWaiter.failures) > 0:
+					for failure in deployments[name].stackWaiter.failures:
+						print("  %s" % failure, "red")
+				else:
+					print("  %s" % scheduler.errors[name], "red")
+			else:
+				print("%s: skipped" % name, "yellow")
+
+		return len(scheduler.errors) == 0 and len(outputs) == len(deployments)
+
+	def _runStages(self, scheduler):
+		""" Run the preparation stages
+
+			Returns dict with the results
+		"""
+		with Halo(text="Preparing deployment") as spinner:
+			try:
+				results = scheduler.run(onChange=lambda names: setattr(spinner, "text", "Preparing deployment: %s" % ", ".join(names)))
+			except Exception:
+				spinner.fail("Preparing deployment failed at: %s" % scheduler.failedStage)
+				raise
+
+			if self.slimmedBytes > 0:
+				spinner.succeed("Preparing deployment, removed %s from the Python packages" % ArchiveTool._formatSize(self.slimmedBytes))
+			else:
+				spinner.succeed("Preparing deployment")
+
+		return results
+
+	def _renderTemplates(self, deployments):
+		""" Create and check the deployment templates
+
+			Parameters:
+				deployments: Dict with the deployments, by name
+
+			Returns dict with the parameters per deployment, or None when a template is invalid
+		"""
+		# Record how long the template takes
+		with TimingTool.phase("template"):
+			parameters = {}
+			valid = True
+
+			with Halo(text="Checking template") as spinner:
+				# Walk through the deployments, to show the errors of all the templates
+				errors = []
+				for name, deployment in deployments.items():
+					try:
+						parameters[name] = deployment._createTemporaryTemplate()
+					except Exception as e:
+						errors.append(str(e) if len(deployments) == 1 else "%s: %s" % (name, e))
+						valid = False
+
+				if valid is True:
+					spinner.succeed("Checking template")
+				else:
+					spinner.fail("Checking template")
+
+			# Show the errors
+			for error in errors:
+				print(error, "red")
+
+			return parameters if valid is True else None
+
+	def _buildArtifact(self, fingerprint):
+		""" Zip the content, unless the artifact is cached
+
+			Returns path to the artifact
+		"""
+		with Halo(text="Zipping content") as spinner:
+			zipPath = CacheTool.getArtifact(fingerprint)
+			if zipPath is None:
+				zipPath = CacheTool.storeArtifact(fingerprint, self._zipContent())
+				spinner.succeed(ArchiveTool.getSummary(self.zipStatistics))
+			else:
+				spinner.succeed("Zipping content (cached)")
+
+		return zipPath
+
+	def _distributeArtifact(self, zipPath, s3Location, deployments):
+		""" Get the artifact in the buckets of all the deployments
+
+			The artifact is uploaded once, the other buckets get a copy made by S3
+		"""
+		# Get a deployment per bucket
+		buckets = {}
+		for deployment in deployments:
+			buckets.setdefault(deployment._getDeploymentBucketName(), deployment)
+
+		with Halo(text="Uploading to S3") as spinner:
+			# Check which buckets need the artifact
+			missing = [deployment for deployment in buckets.values() if deployment._existsInS3(s3Location) is False]
+			if len(missing) == 0:
+				spinner.succeed("Uploading to S3 (already uploaded)")
+				return
+
+			# Find a bucket which has the artifact, or upload it to the first one
+			source = next((deployment for deployment in buckets.values() if deployment not in missing), None)
+			if source is None:
+				source = missing.pop(0)
+				progress = UploadProgress(lambda text: setattr(spinner, "text", "Uploading to S3: %s" % text), totalBytes=os.path.getsize(zipPath))
+				source._uploadToS3(zipPath, s3Location, callback=progress)
+
+			# Check if there are other buckets
+			if len(missing) == 0:
+				spinner.succeed("Uploading to S3")
+				return
+
+			# Copy the artifact to the other buckets at the same time
+			spinner.text = "Copying to %i buckets" % len(missing)
+			with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+				for future in [executor.submit(deployment._copyFromS3, source, s3Location, zipPath) for deployment in missing]:
+					future.result()
+
+			spinner.succeed("Uploading to S3, copied to %i buckets" % len(missing))
+
+	def _copyFromS3(self, source, key, zipPath):
+		""" Copy an object from the bucket of another deployment
+
+			When the bucket can not be read, the file is uploaded instead
+		"""
+		# Record how long the copy takes
+		with TimingTool.phase("copy", bucket=self._getDeploymentBucketName()):
+			try:
+				BotoTool.copyInS3(
+					fromBucket=source._getDeploymentBucketName(),
+					fromRegion=source._getDeploymentRegion(),
+					toBucket=self._getDeploymentBucketName(),
+					key=key,
+					region=self._getDeploymentRegion(),
+					profile=self._getDeploymentProfile(),
+					fromProfile=source._getDeploymentProfile(),
+					transferConfig=ConfigurationTool.getConfig(ConfigKey.TRANSFER)
+				)
+			except Exception:
+				# The profile has no access to the other bucket, like another account
+				self._uploadToS3(zipPath, key)
+
+	def _checkTemplate(self):
+		""" Check if there is a template for a single stack
+		"""
+		# Check if there is an template
+		if os.path.exists("template.yaml") is False:
+			raise Exception("Cant find CloudFormation template: 'template.yaml'")
+
+		# Check if the project has multiple stacks
+		if ConfigurationTool.getConfig(ConfigKey.STACKS) is not None:
+			raise Exception("This is not supported for a project with multiple stacks")
+
+	def _createMatrixDeployments(self):
+		""" Create a deployment per target of the matrix
+
+			Returns dict with the deployments, by name
+		"""
+		# Check the template
+		self._checkTemplate()
+
+		# Create a deployment per target
+		deployments = {}
+		for target in self._getMatrixTargets():
+			deployment = CloudFormationDeployment()
+			deployment.environment = target["environment"]
+			deployment.target = target
+			deployment.templateLocation = self._createTempPath()
+			deployments[target["name"]] = deployment
+
+		return deployments
+
+	def _prepareTargets(self, deployments):
+		""" Check the templates, build once and get the artifact in the bucket of every target
+
+			Returns tuple (parameters per target, stack exists per target, artifact key), or None when a template is invalid
+		"""
+		# Check the templates first, mistakes are found before anything is built
+		templates = self._renderTemplates(deployments)
+		if templates is None:
+			return None
+
+		# Prepare the build once, and the stacks of all the targets
+		scheduler = StageScheduler(maxWorkers=2 + len(deployments))
+		scheduler.add("environment", self._createTempDir)
+		scheduler.add("dependencies", self._checkDependencies, dependsOn=["environment"])
+		for name, deployment in deployments.items():
+			scheduler.add("stack %s" % name, deployment._stackExists)
+
+		results = self._runStages(scheduler)
+
+		# Check if there are other parameters
+		parameters = {}
+		for name, deployment in deployments.items():
+			parameters[name] = deployment._checkParameters(templates[name])
+
+		# Zip it all, once for all the targets
+		fingerprint = self._fingerprintContent()
+		s3Location = self._getArtifactKey(fingerprint)
+		zipPath = self._buildArtifact(fingerprint)
+
+		# Get the artifact in every bucket
+		self._distributeArtifact(zipPath, s3Location, list(deployments.values()))
+
+		return (parameters, dict((name, results["stack %s" % name]) for name in deployments), s3Location)
+
+	def _runTargets(self, deployments, function, text):
+		""" Run a function for all the targets at the same time
+
+			Parameters:
+				deployments: Dict with the deployments, by name
+				function: Function which receives the name, the deployment and a progress function
+				text: Text of the spinner
+
+			Returns tuple (dict with the results, dict with the errors)
+		"""
+		# Remember the progress of every target
+		progress = dict((name, "waiting") for name in deployments)
+
+		def onUpdate(name, progressText):
+			progress[name] = progressText
+			spinner.text = "%s: %s" % (text, ", ".join("%s %s" % (targetName, targetText) for targetName, targetText in progress.items()))
+
+		results = {}
+		errors = {}
+		with Halo(text=text) as spinner:
+			with ThreadPoolExecutor(max_workers=len(deployments)) as executor:
+				futures = {}
+				for name, deployment in deployments.items():
+					futures[name] = executor.submit(function, name, deployment, lambda progressText, name=name: onUpdate(name, progressText))
+
+				# Collect the results
+				for name, future in futures.items():
+					try:
+						results[name] = future.result()
+					except Exception as e:
+						results[name] = False
+						errors[name] = str(e)
+
+			if len(errors) == 0 and False not in results.values():
+				spinner.succeed("%s for %i targets" % (text, len(deployments)))
+			else:
+				spinner.fail("%s failed for %i of %i targets" % (text, list(results.values()).count(False), len(deployments)))
+
+		return (results, errors)
+
+	def _showResults(self, deployments, statuses, errors):
+		""" Show the result of every target
+		"""
+		for name, deployment in deployments.items():
+			if statuses[name] is True:
+				print("%s: %s" % (name, "unchanged" if deployment.unchanged is True else "deployed"), "green")
+				continue
+
+			print("%s: failed" % name, "red")
+			if name in errors:
+				print("  %s" % errors[name], "red")
+			elif deployment.stackWaiter is not None:
+				for failure in deployment.stackWaiter.failures:
+					print("  %s" % failure, "red")
+
+	def _planTarget(self, deployment, parameters, s3Location, stackExists):
+		""" Create the change set of a target
+
+			Returns dict with the change set, or None when nothing changes
+		"""
+		templateUrl = deployment._uploadTemplate()
+		return deployment._planChangeSet(parameters, s3Location, stackExists, templateUrl)
+
+	def _getPlanPath(self):
+		""" Get the path to the plan of the project
+
+			Returns path
+		"""
+		return os.path.join(os.path.dirname(ConfigurationTool._getProjectPath()), "plan")
+
+	def _readPlan(self):
+		""" Read the plan of the project
+
+			Returns dict with the plan, or None when there is no plan
+		"""
+		# Check if there is a plan
+		path = self._getPlanPath()
+		if os.path.exists(path) is False:
+			return None
+
+		# Read the plan
+		try:
+			f = open(path, "r")
+			plan = json.loads(f.read())
+			f.close()
+		except Exception:
+			raise Exception("Could not read the plan at '%s'. Delete the file and create a new plan!" % path)
+
+		return plan
+
+	def _savePlan(self, deployments, changeSets):
+		""" Save the change sets of a plan, to apply them later
+		"""
+		# Remember where every change set is
+		plan = {"created": int(time.time()), "targets": []}
+		for name, changeSet in changeSets:
+			deployment = deployments[name]
+			plan["targets"].append({
+				"name": name,
+				"environment": str(deployment.environment),
+				"region": deployment._getDeploymentRegion(),
+				"bucket": deployment._getDeploymentBucketName(),
+				"profile": deployment._getDeploymentProfile(),
+				"stackName": changeSet["stackName"],
+				"changeSetName": changeSet["changeSetName"],
+				"changeSetType": changeSet["changeSetType"]
+			})
+
+		# Save the plan
+		self._writePlan(plan)
+
+	def _writePlan(self, plan):
+		""" Write the plan of the project
+		"""
+		f = open(self._getPlanPath(), "w")
+		f.write(json.dumps(plan, indent=4))
+		f.close()
+
+	def _discardPlan(self):
+		""" Remove the change sets of the plan of the project
+		"""
+		# Check if there is a plan
+		plan = self._readPlan()
+		if plan is None:
+			return
+
+		# Remove the change sets
+		for target in plan["targets"]:
+			self._getPlanDeployment(target)._discardChangeSet(target["stackName"], target["changeSetName"], target["changeSetType"])
+
+		os.remove(self._getPlanPath())
+
+	def _getPlanDeployment(self, target):
+		""" Create the deployment of a target of the plan
+
+			Returns a CloudFormationDeployment
+		"""
+		deployment = CloudFormationDeployment()
+		deployment.environment = EnvironmentEnum(target["environment"])
+		deployment.target = {"region": target["region"], "bucket": target["bucket"], "profile": target["profile"]}
+		return deployment
+
+	def _deployTarget(self, deployment, parameters, s3Location, stackExists, onUpdate):
+		""" Deploy a matrix target
+
+			Returns boolean
+		"""
+		templateUrl = deployment._uploadTemplate()
+		return deployment._cloudformationDeploy(parameters, s3Location, stackExists, templateUrl, onUpdate=onUpdate)
+
+	def _getMatrixTargets(self):
+		""" Get the targets of the matrix from the project config
+
+			Returns list with a dict per target
+		"""
+		# Get the matrix
+		matrix = ConfigurationTool.getConfig(ConfigKey.MATRIX)
+		if matrix is None or len(matrix) == 0:
+			raise Exception("There is no matrix in the project config. Add a list of targets with an environment and a region.")
+
+		# Walk through the targets
+		targets = []
+		for target in matrix:
+			# Check the environment
+			try:
+				environment = EnvironmentEnum(target.get("environment", "development"))
+			except ValueError:
+				raise Exception("Unknown environment '%s' in the matrix" % target.get("environment"))
+
+			# Check the region
+			if target.get("region") is None:
+				raise Exception("Every target in the matrix needs a region")
+
+			# Check the name
+			name = target.get("name", "%s/%s" % (environment, target["region"]))
+			if name in [item["name"] for item in targets]:
+				raise Exception("There are multiple targets named '%s' in the matrix" % name)
+
+			# Lambda only reads the code from a bucket in the same region, the bucket of the environment is in its region
+			environmentRegion = ConfigurationTool.getConfig(ConfigKey.DEV_REGION if environment == EnvironmentEnum.DEVELOPMENT else ConfigKey.PROD_REGION)
+			if target.get("bucket") is None and target["region"] != environmentRegion:
+				raise Exception("Target '%s' in the matrix needs its own bucket in %s, the bucket of the %s environment is in %s" % (name, target["region"], environment, environmentRegion))
+
+			targets.append({
+				"name": name,
+				"environment": environment,
+				"region": target["region"],
+				"bucket": target.get("bucket"),
+				"profile": target.get("profile")
+			})
+
+		return targets
+
+	def _getStacks(self):
+		""" Get the stacks from the project config
+
+			Returns list with a dict per stack, in the order of the config
+		"""
+		# Walk through the stacks
+		stacks = []
+		for stack in ConfigurationTool.getConfig(ConfigKey.STACKS):
+			# Check the name
+			if stack.get("name") is None:
+				raise Exception("Every stack in the project config needs a name")
+			if stack["name"] in [item["name"] for item in stacks]:
+				raise Exception("There are multiple stacks named '%s'" % stack["name"])
+
+			# Check the template
+			template = stack.get("template", "%s.yaml" % stack["name"])
+			if os.path.exists(template) is False:
+				raise Exception("Cant find CloudFormation template of stack '%s': '%s'" % (stack["name"], template))
+
+			# A stack depends on the stacks it gets outputs from
+			outputs = stack.get("outputs", {})
+			depends = list(stack.get("depends", []))
+			for parameterName, output in outputs.items():
+				if "." not in output:
+					raise Exception("Output '%s' of stack '%s' should look like 'stack.OutputKey'" % (output, stack["name"]))
+				if output.split(".", 1)[0] not in depends:
+					depends.append(output.split(".", 1)[0])
+
+			stacks.append({
+				"name": stack["name"],
+				"stackName": stack.get("stack-name", "%s-%s" % (ConfigurationTool.getConfig(ConfigKey.STACK_NAME), stack["name"])),
+				"template": template,
+				"depends": depends,
+				"outputs": outputs
+			})
+
+		# Check if all the stacks we depend on exist
+		for stack in stacks:
+			for dependency in stack["depends"]:
+				if dependency not in [item["name"] for item in stacks]:
+					raise Exception("Stack '%s' depends on unknown stack '%s'" % (stack["name"], dependency))
+
+		# Check if the stacks do not depend on each other, before anything is built
+		scheduler = StageScheduler()
+		for stack in stacks:
+			scheduler.add(stack["name"], None, dependsOn=stack["depends"])
+		cycle = scheduler.getCycle()
+		if len(cycle) > 0:
+			raise Exception("The stacks %s depend on each other" % ", ".join(cycle))
+
+		return stacks
+
+	def _getStackName(self):
+		""" Get the name of the CloudFormation stack
+
+			Returns name of the stack
+		"""
+		# Check if this is one of multiple stacks
+		if self.stack is not None:
+			return self.stack["stackName"]
+
+		return ConfigurationTool.getConfig(ConfigKey.STACK_NAME)
+
+	def _getStackOutputs(self):
+		""" Get the outputs of the CloudFormation stack
+
+			Returns dict with the output values
+		"""
+		# Get the boto client
+		client = BotoTool._getClient("cloudformation", region=self._getDeploymentRegion(), profile=self._getDeploymentProfile())
+
+		# Get the stack
+		stack = client.describe_stacks(StackName=self._getStackName())["Stacks"][0]
+
+		return dict((output["OutputKey"], output["OutputValue"]) for output in stack.get("Outputs", []))
+
+	def _getTemplatePath(self):
+		""" Get the path to the deployment template
+
+			Returns path
+		"""
+		return os.path.join(self.templateLocation if self.templateLocation is not None else self.location, ".deployment.template.json")
 
 	def _createTemporaryTemplate(self):
 		""" Create a temporary template
@@ -80,10 +865,11 @@ class CloudFormationDeployment(IDeploymentAction):
 			Returns a dict with the parameters
 		"""
 		# Get the template
-		f = open("template.yaml", "r")
+		f = open(self.stack["template"] if self.stack is not None else "template.yaml", "r")
 		template = f.read()
 		f.close()
 		template = TemplateTool.parseTemplate(template)
+		itemNames = list(template['Resources'].keys())
 
 		# Check the environment
 		if self.environment == EnvironmentEnum.DEVELOPMENT:
@@ -97,83 +883,270 @@ class CloudFormationDeployment(IDeploymentAction):
 		# Check the parameters
 		template, parameters = TemplateTool.checkVariables(template)
 
+		# Check the references, before anything is built
+		renamedItems = dict((itemName, itemName + "Dev") for itemName in itemNames if itemName not in template['Resources'])
+		errors = TemplateTool.validateTemplate(template, renamedItems)
+		if len(errors) > 0:
+			raise Exception("The template has %i errors:\n%s" % (len(errors), "\n".join("  %s" % error for error in errors)))
+
 		# Save the template
-		f = open(os.path.join(self.location, ".deployment.template.json"), "w")
+		f = open(self._getTemplatePath(), "w")
 		f.write(json.dumps(template))
 		f.close()
 
 		# Add the basic parameters
 		parameters['environment'] = self.environment
-		parameters['stackName'] = ConfigurationTool.getConfig(ConfigKey.STACK_NAME) + ("_development" if ConfigurationTool.getConfig(ConfigKey.DEV_SUFFIX) is True and self.environment == EnvironmentEnum.DEVELOPMENT else "")
+		parameters['stackName'] = self._getStackName() + ("_development" if ConfigurationTool.getConfig(ConfigKey.DEV_SUFFIX) is True and self.environment == EnvironmentEnum.DEVELOPMENT else "")
 		parameters['projectName'] = ConfigurationTool.getConfig(ConfigKey.STACK_NAME)
 
 		return parameters
 
-	def _zipContent(self):
-		""" Zip the current directory
+	def _getContentFiles(self):
+		""" Get the files which should be deployed
 
-			Returns the zip filename
+			Returns a list of tuples (path, arcname)
 		"""
-		# Create a list of ignored folders
-		ignoredFolders = [".git", ".svn", ".pete", ".vscode", "seeders"]
+		return StagingTool.listFiles(self.location)
+
+	def _fingerprintContent(self):
+		""" Create a fingerprint of the content which will be deployed
 
-		# Create a filename
-		zipFileName = "pete_%s.zip" % int(time.time())
+			Returns the fingerprint
+		"""
+		# Record how long the fingerprint takes
+		with TimingTool.phase("fingerprint"):
+			return CacheTool.fingerprint(self._getContentFiles())
 
-		# Create the zip file
-		with zipfile.ZipFile(os.path.join(self.location, zipFileName), "w", zipfile.ZIP_DEFLATED) as zipFile:
-			# Walk through all the files
-			for root, dirs, files in os.walk(self.location):
-				# Check the ignored folders
-				goToNext = False
-				for ignoredFolderName in ignoredFolders:
-					if ignoredFolderName in root:
-						goToNext = True
-						break
+	def _zipContent(self, fileObject=None):
+		""" Zip the current directory
 
-				# Check if we found a ignored folder
-				if goToNext is True:
-					continue
+			Parameters:
+				fileObject: Stream to write the zip to, instead of a file
 
-				# Walk throught the files of the directory
-				for fileName in files:
-					# Check if this is an zip
-					if ".zip" in fileName:
-						continue
+			Returns path to the zip file, or None when a stream is used
+		"""
+		# Open the zip file, outside the staging directory so it is never zipped itself
+		f = fileObject
+		zipPath = None
+		if fileObject is None:
+			zipPath = CacheTool.createArtifactPath()
+			f = open(zipPath, "wb")
+
+		# Create the zip file, compressed on all the cores
+		try:
+			with TimingTool.phase("zip"):
+				self.zipStatistics = ArchiveTool.createZip(
+					self._getContentFiles(),
+					f,
+					workers=ConfigurationTool.getConfig(ConfigKey.ZIP_WORKERS),
+					policy=CompressionPolicy.fromConfig(ConfigurationTool.getConfig(ConfigKey.COMPRESSION)),
+					reproducible=ConfigurationTool.getConfig(ConfigKey.REPRODUCIBLE_ZIP) is True
+				)
+		except Exception:
+			# Remove the half written zip
+			if fileObject is None:
+				f.close()
+				os.remove(zipPath)
+			raise
 
-					# Add them to the zip file
-					arcname = os.path.join(root, fileName)[len(self.location):]
-					zipFile.write(os.path.join(root, fileName), arcname=arcname)
+		# Close the zip file
+		if fileObject is None:
+			f.close()
 
-		return zipFileName
+		return zipPath
 
-	def _uploadToS3(self, zipName):
+	def _uploadToS3(self, zipPath, fullFileName, callback=None):
 		""" Upload the zip file to S3
 		"""
-		# Create a full filename
-		fullFileName = "%s/%s" % ((ConfigurationTool.getConfig(ConfigKey.STACK_NAME).lower()), zipName)
+		# Record how long the upload takes
+		with TimingTool.phase("upload", bucket=self._getDeploymentBucketName()):
+			# Get the bucket name and profile
+			bucketName = self._getDeploymentBucketName()
+			profileName = self._getDeploymentProfile()
+			region = self._getDeploymentRegion()
+
+			# Upload the file
+			BotoTool.uploadToS3(
+				fromPath=zipPath,
+				toBucket=bucketName,
+				toKey=fullFileName,
+				region=region,
+				profile=profileName,
+				transferConfig=ConfigurationTool.getConfig(ConfigKey.TRANSFER),
+				callback=callback
+			)
+
+			return fullFileName
+
+	def _streamToS3(self, fullFileName, callback=None):
+		""" Zip the content straight into a S3 multipart upload
+		"""
+		# Record how long the zip and upload takes
+		with TimingTool.phase("zip and upload", bucket=self._getDeploymentBucketName()):
+			# Open the stream
+			stream = BotoTool.openS3Stream(
+				toBucket=self._getDeploymentBucketName(),
+				toKey=fullFileName,
+				region=self._getDeploymentRegion(),
+				profile=self._getDeploymentProfile(),
+				transferConfig=ConfigurationTool.getConfig(ConfigKey.TRANSFER),
+				callback=callback
+			)
+
+			# Zip the content into the stream
+			try:
+				self._zipContent(fileObject=stream)
+			except Exception:
+				stream.abort()
+				raise
+
+			# Complete the upload
+			stream.close()
+
+			return fullFileName
+
+	def _uploadTemplate(self):
+		""" Upload the deployment template to S3, unless it is already there
+
+			Returns the url of the template
+		"""
+		# Record how long the template upload takes
+		with TimingTool.phase("template upload", bucket=self._getDeploymentBucketName()):
+			# Name the template after its content
+			templatePath = self._getTemplatePath()
+			stackName = ConfigurationTool.getConfig(ConfigKey.STACK_NAME)
+			templateName = "%s/template-%s.json" % (stackName.lower(), CacheTool.hashFile(templatePath))
+
+			# Check if the template is already uploaded
+			if self._existsInS3(templateName) is True:
+				return "https://%s.s3.%s.amazonaws.com/%s" % (self._getDeploymentBucketName(), self._getDeploymentRegion(), templateName)
+
+			# Upload the file
+			return BotoTool.uploadToS3(
+				fromPath=templatePath,
+				toBucket=self._getDeploymentBucketName(),
+				toKey=templateName,
+				region=self._getDeploymentRegion(),
+				profile=self._getDeploymentProfile(),
+				transferConfig=ConfigurationTool.getConfig(ConfigKey.TRANSFER)
+			)
+
+	def _existsInS3(self, key):
+		""" Check if an object exists in the deployment bucket
+
+			Returns boolean
+		"""
+		return BotoTool.existsInS3(
+			bucket=self._getDeploymentBucketName(),
+			key=key,
+			region=self._getDeploymentRegion(),
+			profile=self._getDeploymentProfile()
+		)
+
+	def _getArtifactKey(self, fingerprint):
+		""" Get the S3 key of an artifact, named after the fingerprint of its content
+
+			Returns the key
+		"""
+		return "%s/pete_%s.zip" % ((ConfigurationTool.getConfig(ConfigKey.STACK_NAME).lower()), fingerprint)
+
+	def collectGarbage(self, keep):
+		""" Find the old artifacts and templates in the deployment bucket
+
+			Parameters:
+				keep: Number of the most recently used artifacts and templates to keep
+
+			Returns list with the keys to remove
+		"""
+		# Check the number to keep
+		if keep < 1:
+			raise Exception("Keep at least 1 artifact, use --keep with a number of 1 or more")
 
-		# Get the bucket name and profile
+		# Get the information
 		bucketName = self._getDeploymentBucketName()
 		profileName = self._getDeploymentProfile()
 		region = self._getDeploymentRegion()
+		stackName = ConfigurationTool.getConfig(ConfigKey.STACK_NAME)
 
-		# Upload the file
-		BotoTool.uploadToS3(
-			fromPath=os.path.join(self.location, zipName),
-			toBucket=bucketName,
-			toKey=fullFileName,
-			region=region,
-			profile=profileName
-		)
+		# Get the names of the stacks of the project
+		stackNames = [stackName]
+		if ConfigurationTool.getConfig(ConfigKey.STACKS) is not None:
+			stackNames = [stack["stackName"] for stack in self._getStacks()]
+
+		# Get the deployments which use the bucket, this one and the targets of the matrix
+		deployments = [self]
+		if ConfigurationTool.getConfig(ConfigKey.MATRIX) is not None:
+			for target in self._getMatrixTargets():
+				deployment = CloudFormationDeployment()
+				deployment.environment = target["environment"]
+				deployment.target = target
+				deployments.append(deployment)
+
+		# Get the artifacts the stacks use, they are never removed
+		referenced = set()
+		checked = set()
+		for deployment in deployments:
+			# Check if the deployment uses this bucket, and if we checked its region before
+			key = (deployment._getDeploymentRegion(), deployment._getDeploymentProfile())
+			if deployment._getDeploymentBucketName() != bucketName or key in checked:
+				continue
+			checked.add(key)
+
+			client = BotoTool._getClient("cloudformation", region=key[0], profile=key[1])
+			for name in stackNames:
+				try:
+					stack = client.describe_stacks(StackName=name)["Stacks"][0]
+				except Exception:
+					# The stack does not exist
+					continue
 
-		return fullFileName
+				referenced.update(self._getArtifactParameters(stack))
+
+		# Get the artifacts of the change sets of the plan, they are read when the plan is applied
+		plan = self._readPlan()
+		for target in (plan["targets"] if plan is not None else []):
+			# Check if the target uses this bucket
+			if target["bucket"] != bucketName:
+				continue
+
+			client = BotoTool._getClient("cloudformation", region=target["region"], profile=target["profile"])
+			try:
+				changeSet = client.describe_change_set(StackName=target["stackName"], ChangeSetName=target["changeSetName"])
+			except Exception:
+				# The change set does not exist anymore
+				continue
+
+			referenced.update(self._getArtifactParameters(changeSet))
+
+		# Get the objects of the stack, the newest first
+		objects = BotoTool.listS3Objects(bucketName, "%s/" % stackName.lower(), region=region, profile=profileName)
+		objects.sort(key=lambda item: item["LastModified"], reverse=True)
+
+		# Keep the recently uploaded objects, a running deployment may not have updated its stack yet
+		referenced.update(item["Key"] for item in objects if time.time() - item["LastModified"].timestamp() < self.GARBAGE_MIN_AGE)
+
+		# Find the artifacts and templates beyond the ones we keep
+		artifacts = [item["Key"] for item in objects if os.path.basename(item["Key"]).startswith("pete_") and item["Key"].endswith(".zip")]
+		templates = [item["Key"] for item in objects if os.path.basename(item["Key"]).startswith("template-") and item["Key"].endswith(".json")]
+
+		return [key for key in artifacts[keep:] + templates[keep:] if key not in referenced]
+
+	def _getArtifactParameters(self, stack):
+		""" Get the artifacts in the parameters of a stack or a change set
+
+			Returns list with the keys
+		"""
+		return [parameter["ParameterValue"] for parameter in stack.get("Parameters", []) if parameter["ParameterKey"] == "s3FileName"]
 
 	def _getDeploymentBucketName(self):
 		""" Get the deployment Bucket name from the config
 
 			Returns name of the bucket
 		"""
+		# Check if the matrix target has a bucket
+		if self.target is not None and self.target.get("bucket") is not None:
+			return self.target["bucket"].strip()
+
 		# Check if we use the development environment
 		if self.environment == EnvironmentEnum.DEVELOPMENT:
 			# Check if the DEV_BUCKET is in the projectConfig
@@ -191,6 +1164,10 @@ class CloudFormationDeployment(IDeploymentAction):
 
 			Returns name of profile
 		"""
+		# Check if the matrix target has a profile
+		if self.target is not None and self.target.get("profile") is not None:
+			return self.target["profile"].strip()
+
 		# Check if we use the development environment
 		if self.environment == EnvironmentEnum.DEVELOPMENT:
 			# Check if the DEV_PROFILE is in the projectConfig
@@ -208,6 +1185,10 @@ class CloudFormationDeployment(IDeploymentAction):
 
 			Returns name of region
 		"""
+		# Check if the matrix target has a region
+		if self.target is not None and self.target.get("region") is not None:
+			return self.target["region"].strip()
+
 		# Default option for region
 		region = None
 
@@ -223,55 +1204,69 @@ class CloudFormationDeployment(IDeploymentAction):
 
 		return region
 
-	def _cloudformationDeploy(self, parameters, s3Location):
+	def _stackExists(self):
+		""" Check if the stack exists in CloudFormation
+
+			Returns boolean
+		"""
+		# Record how long the stack check takes
+		with TimingTool.phase("stack check", stack=self._getStackName()):
+			# Get the boto client
+			client = BotoTool._getClient("cloudformation", region=self._getDeploymentRegion(), profile=self._getDeploymentProfile())
+
+			# Check if the stack exists
+			try:
+				stack = client.describe_stacks(StackName=self._getStackName())["Stacks"][0]
+			except Exception:
+				# There are currently no stacks in CloudFormation
+				return False
+
+			# A stack of a plan which was never applied does not exist yet, it can only be created with a change set
+			self.stackInReview = stack.get("StackStatus") == "REVIEW_IN_PROGRESS"
+
+			return self.stackInReview is False
+
+	def _cloudformationDeploy(self, parameters, s3Location, stackExists=None, templateUrl=None, onUpdate=None):
 		""" Deploy to CloudFormation
+
+			Parameters:
+				onUpdate: Function which receives the progress of the stack
+
+			Returns boolean
 		"""
 		# Get the information
-		deploymentBucket = self._getDeploymentBucketName()
 		profileName = self._getDeploymentProfile()
 		region = self._getDeploymentRegion()
-		stackName = ConfigurationTool.getConfig(ConfigKey.STACK_NAME)
+		stackName = self._getStackName()
 
 		# Get the boto client
 		client = BotoTool._getClient("cloudformation", region=region, profile=profileName)
 
 		# Check if the stack exists
-		stackExists = False
-		try:
-			client.describe_stacks(StackName=stackName)
-		except Exception:
-			# There are currently no stacks in CloudFormation
-			pass
-		else:
-			# The stack exists
-			stackExists = True
-
-		# Upload the file to S3
-		templatePath = os.path.join(self.location, ".deployment.template.json")
-		templateName = "%s/template-%s.json" % (stackName.lower(), str(int(time.time())))
-		templateUrl = BotoTool.uploadToS3(
-			fromPath=templatePath,
-			toBucket=deploymentBucket,
-			toKey=templateName,
-			region=region,
-			profile=profileName
-		)
+		if stackExists is None:
+			stackExists = self._stackExists()
+
+		# Upload the template to S3
+		if templateUrl is None:
+			templateUrl = self._uploadTemplate()
 
 		# Create a change set name
 		changeStackName = "%s%s" % (stackName, str(int(time.time())))
 
 		# Create the change set parameters
-		changeStackParameters = [
-			{"ParameterKey": "deploymentBucket", "ParameterValue": deploymentBucket},
-			{"ParameterKey": "s3FileName", "ParameterValue": s3Location}
-		]
+		changeStackParameters = self._getStackParameters(parameters, s3Location)
 
-		# Add extra parameters
-		for key, value in parameters.items():
-			changeStackParameters.append({"ParameterKey": key, "ParameterValue": str(value)})
+		# Check if the stack already runs this template with these parameters
+		if stackExists is True and self._isDeployed(client, changeStackParameters) is True:
+			self.unchanged = True
+			return True
 
-		# Check if the stack exists
-		if stackExists is False:
+		# Follow the events of the stack
+		waiter = StackWaiter(client, stackName, onUpdate=onUpdate)
+		self.stackWaiter = waiter
+
+		# Check if the stack exists, a stack of a plan is created with a change set
+		if stackExists is False and self.stackInReview is False:
 			# Create the stack
 			client.create_stack(
 				StackName=stackName,
@@ -280,67 +1275,216 @@ class CloudFormationDeployment(IDeploymentAction):
 				Capabilities=["CAPABILITY_IAM"],
 				Tags=[
 					{"Key": "Stack", "Value": stackName},
-				]
+				],
+				ClientRequestToken=waiter.mark()
 			)
 
 		else:
-			# Create a change set
+			# Record how long the change set takes
+			with TimingTool.phase("change set", stack=stackName):
+				# Create a change set
+				client.create_change_set(
+					StackName=stackName,
+					ChangeSetName=changeStackName,
+					ChangeSetType="UPDATE" if stackExists is True else "CREATE",
+					TemplateURL=templateUrl,
+					Parameters=changeStackParameters,
+					Capabilities=["CAPABILITY_IAM"],
+					Tags=[
+						{"Key": "Stack", "Value": stackName},
+					]
+				)
+
+				# Wait for the change set
+				changeSet = waiter.waitForChangeSet(changeStackName)
+			if changeSet["Status"] != "CREATE_COMPLETE":
+				# Check if there was nothing to change
+				reason = changeSet.get("StatusReason", "")
+				if "didn't contain changes" in reason or "No updates are to be performed" in reason:
+					client.delete_change_set(StackName=stackName, ChangeSetName=changeStackName)
+					self.unchanged = True
+					return True
+
+				waiter.failures.append("Change set: %s" % (reason if reason != "" else changeSet["Status"]))
+				return False
+
+			# Apply the change set
+			client.execute_change_set(
+				ChangeSetName=changeStackName,
+				StackName=stackName,
+				ClientRequestToken=waiter.mark()
+			)
+
+		# Wait for the results
+		with TimingTool.phase("stack wait", stack=stackName):
+			status = waiter.waitForStack()
+
+		return StackWaiter.isSuccess(status)
+
+	def _getStackParameters(self, parameters, s3Location):
+		""" Get the parameters of the stack
+
+			Returns list with the parameters for CloudFormation
+		"""
+		# Add the deployment parameters
+		stackParameters = [
+			{"ParameterKey": "deploymentBucket", "ParameterValue": self._getDeploymentBucketName()},
+			{"ParameterKey": "s3FileName", "ParameterValue": s3Location}
+		]
+
+		# Add extra parameters
+		for key, value in parameters.items():
+			stackParameters.append({"ParameterKey": key, "ParameterValue": str(value)})
+
+		return stackParameters
+
+	def _planChangeSet(self, parameters, s3Location, stackExists, templateUrl):
+		""" Create a change set, without executing it
+
+			Returns dict with the change set and its changes, or None when nothing changes
+		"""
+		# Get the information
+		client = BotoTool._getClient("cloudformation", region=self._getDeploymentRegion(), profile=self._getDeploymentProfile())
+		stackName = self._getStackName()
+		stackParameters = self._getStackParameters(parameters, s3Location)
+
+		# Check if the stack already runs this template with these parameters
+		if stackExists is True and self._isDeployed(client, stackParameters) is True:
+			return None
+
+		# Create the change set, a new stack is created by the change set
+		changeSetName = "pete-plan-%i" % int(time.time())
+		changeSetType = "UPDATE" if stackExists is True else "CREATE"
+		with TimingTool.phase("change set", stack=stackName):
 			client.create_change_set(
 				StackName=stackName,
-				ChangeSetName=changeStackName,
+				ChangeSetName=changeSetName,
+				ChangeSetType=changeSetType,
 				TemplateURL=templateUrl,
-				Parameters=changeStackParameters,
+				Parameters=stackParameters,
 				Capabilities=["CAPABILITY_IAM"],
 				Tags=[
 					{"Key": "Stack", "Value": stackName},
 				]
 			)
 
-			# Wait for the results
-			while True:
-				# Get the change set
-				changeSet = client.describe_change_set(StackName=stackName, ChangeSetName=changeStackName)
+			# Wait for the change set
+			changeSet = StackWaiter(client, stackName).waitForChangeSet(changeSetName)
+		if changeSet["Status"] != "CREATE_COMPLETE":
+			reason = changeSet.get("StatusReason", changeSet["Status"])
+			self._discardChangeSet(stackName, changeSetName, changeSetType)
 
-				# Try to get the status
-				try:
-					stackStatus = changeSet["Status"]
-				except Exception:
-					stackStatus = "CREATE_IN_PROGRESS"
+			# Check if there was nothing to change
+			if "didn't contain changes" in reason or "No updates are to be performed" in reason:
+				return None
+			raise Exception("Creating the change set failed: %s" % reason)
 
-				# Check the status
-				if stackStatus[-9:] == "_COMPLETE":
-					break
-				elif stackStatus[-7:] == "_FAILED":
-					return False
+		return {
+			"stackName": stackName,
+			"changeSetName": changeSetName,
+			"changeSetType": changeSetType,
+			"changes": ChangeSetTool.getChanges(client, stackName, changeSetName)
+		}
 
-				# Wait a little
-				time.sleep(15)
+	def _applyChangeSet(self, stackName, changeSetName, onUpdate=None):
+		""" Execute a planned change set
 
-			# Apply the change set
-			client.execute_change_set(
-				ChangeSetName=changeStackName,
-				StackName=stackName
-			)
+			Returns boolean
+		"""
+		# Record how long the stack wait takes
+		with TimingTool.phase("stack wait", stack=stackName):
+			# Get the boto client
+			client = BotoTool._getClient("cloudformation", region=self._getDeploymentRegion(), profile=self._getDeploymentProfile())
 
-		# Wait for the results
-		while True:
-			# Get the stack
-			stack = client.describe_stacks(StackName=stackName)
+			# Check if the change set can still be executed
+			try:
+				changeSet = client.describe_change_set(StackName=stackName, ChangeSetName=changeSetName)
+			except botocore.exceptions.ClientError as e:
+				# Other errors, like throttling, are tried again with the next apply
+				if e.response["Error"]["Code"] != "ChangeSetNotFound" and "does not exist" not in e.response["Error"].get("Message", ""):
+					raise
+				self.changeSetDone = True
+				raise Exception("The change set does not exist anymore, create a new plan")
+			if changeSet.get("ExecutionStatus") != "AVAILABLE":
+				self.changeSetDone = True
+				raise Exception("The change set can not be executed (%s), create a new plan" % changeSet.get("ExecutionStatus"))
+
+			# Execute the change set
+			waiter = StackWaiter(client, stackName, onUpdate=onUpdate)
+			self.stackWaiter = waiter
+			client.execute_change_set(ChangeSetName=changeSetName, StackName=stackName, ClientRequestToken=waiter.mark())
+			self.changeSetDone = True
+
+			# Wait for the results
+			return StackWaiter.isSuccess(waiter.waitForStack())
 
-			# Try to get the status
+	def _discardChangeSet(self, stackName, changeSetName, changeSetType):
+		""" Remove a change set, and the empty stack a new stack change set creates
+		"""
+		# Get the boto client
+		client = BotoTool._getClient("cloudformation", region=self._getDeploymentRegion(), profile=self._getDeploymentProfile())
+
+		# Remove the change set
+		try:
+			client.delete_change_set(StackName=stackName, ChangeSetName=changeSetName)
+		except Exception:
+			# The change set is already gone
+			pass
+
+		# Remove the stack which only exists for the change set
+		if changeSetType == "CREATE":
 			try:
-				stackStatus = stack["Stacks"][0]["StackStatus"]
+				stack = client.describe_stacks(StackName=stackName)["Stacks"][0]
 			except Exception:
-				stackStatus = "CREATE_IN_PROGRESS"
+				return
+			if stack["StackStatus"] == "REVIEW_IN_PROGRESS":
+				client.delete_stack(StackName=stackName)
+				client.get_waiter("stack_delete_complete").wait(StackName=stackName, WaiterConfig={"Delay": 2})
+
+	def _isDeployed(self, client, stackParameters):
+		""" Check if the stack already runs the deployment template with the same parameters
+
+			The parameters contain the name of the artifact, which is named after its content
+
+			Returns boolean
+		"""
+		# Get the local template
+		f = open(self._getTemplatePath(), "r")
+		localTemplate = json.loads(f.read())
+		f.close()
 
-			# Check the status
-			if stackStatus[-9:] == "_COMPLETE":
-				return True
-			elif stackStatus[-7:] == "_FAILED":
+		# The values of SSM parameters are read by CloudFormation, a changed value only reaches the stack with a change set
+		for parameter in localTemplate.get("Parameters", {}).values():
+			if str(parameter.get("Type", "")).startswith("AWS::SSM::Parameter::") is True:
+				return False
+
+		# Get the stack
+		try:
+			stack = client.describe_stacks(StackName=self._getStackName())["Stacks"][0]
+		except Exception:
+			return False
+
+		# Only compare with a stack which was changed successfully
+		if stack["StackStatus"] not in ["CREATE_COMPLETE", "UPDATE_COMPLETE", "IMPORT_COMPLETE"]:
+			return False
+
+		# Compare the parameters, the ones we dont send keep their default value
+		deployedParameters = dict((parameter["ParameterKey"], parameter.get("ParameterValue")) for parameter in stack.get("Parameters", []))
+		for parameter in stackParameters:
+			if deployedParameters.get(parameter["ParameterKey"]) != parameter["ParameterValue"]:
+				return False
+
+		# Get the deployed template
+		template = client.get_template(StackName=self._getStackName(), TemplateStage="Original")["TemplateBody"]
+		if isinstance(template, str):
+			try:
+				template = json.loads(template)
+			except ValueError:
+				# The stack was not deployed with a template of Pete
 				return False
 
-			# Wait a little
-			time.sleep(15)
+		# Compare the template
+		return template == localTemplate
 
 	def _checkParameters(self, parameters):
 		""" Check if there are other parameters we need information about
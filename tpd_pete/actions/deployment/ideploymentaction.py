@@ -1,10 +1,16 @@
 import os
+import shutil
 import subprocess
 import sys
 import tempfile
 from enum import Enum
 
 from ..iaction import IAction
+from ...tools.cache import CacheTool
+from ...tools.configuration import ConfigurationTool, ConfigKey
+from ...tools.slim import SlimTool
+from ...tools.staging import StagingTool
+from ...tools.timing import TimingTool
 
 
 class EnvironmentEnum(Enum):
@@ -28,36 +34,162 @@ class IDeploymentAction(IAction):
 		# Set the default environment to development
 		self.environment = EnvironmentEnum.DEVELOPMENT
 
+		# Number of bytes removed from the Python packages
+		self.slimmedBytes = 0
+
+		# The temporary directories, they are removed after the deployment
+		self.tempDirs = []
+
+	def removeTempDirs(self):
+		""" Remove the temporary directories of the deployment
+		"""
+		for path in self.tempDirs:
+			shutil.rmtree(path, ignore_errors=True)
+		self.tempDirs = []
+
 	def _createTempDir(self):
 		""" Create a temporary directory for deployment
 
 			Returns path
 		"""
-		# Create the directory
-		self.location = tempfile.mkdtemp()
+		# Record how long the staging takes
+		with TimingTool.phase("staging"):
+			# Create the directory
+			self.location = self._createTempPath()
 
-		# Copy all the current files to it
-		subprocess.check_call("cp -R %s %s" % (".", self.location), shell=True)
+			# The node_modules are installed from package.json, so they dont have to be staged
+			extraPatterns = ["/node_modules/"] if os.path.exists("package.json") is True else None
 
-		return self.location
+			# Link or copy only the files that will be deployed
+			files = StagingTool.listFiles(".", folderLinks=True, matcher=StagingTool.getIgnoreMatcher(extraPatterns))
+			StagingTool.stage(files, self.location, link=self._useLinks())
+
+			return self.location
 
 	def _checkDependencies(self):
 		""" Check which dependencies we should install
 		"""
-		# Check NodeJS 'package.json'
-		if os.path.exists("package.json") is True:
-			subprocess.check_call("npm install --production --ignore-scripts --no-audit --prefix %s" % self.location, shell=True)
+		# Record how long the dependencies take
+		with TimingTool.phase("dependencies"):
+			# Check NodeJS 'package.json'
+			if os.path.exists("package.json") is True:
+				installedPath = self._getDependencies("npm", ["package.json", "package-lock.json", "npm-shrinkwrap.json"], self._installNodeDependencies)
+				StagingTool.stageFolder(os.path.join(installedPath, "node_modules"), os.path.join(self.location, "node_modules"), link=self._useLinks())
+
+			# Check Python 'requirements.txt'
+			if os.path.exists("requirements.txt") is True:
+				installedPath = self._getDependencies("pip", ["requirements.txt"], self._installPipDependencies)
+				self._stagePythonPackages(installedPath)
+
+			# Check Python 'poetry.lock'
+			if os.path.exists("poetry.lock") is True:
+				installedPath = self._getDependencies("poetry", ["poetry.lock"], self._installPoetryDependencies)
+				self._stagePythonPackages(installedPath)
+
+			# Check Python virtualenv
+			elif os.getenv("VIRTUAL_ENV") is not None:
+				self._stagePythonPackages(self._getSitePackagesPath(os.getenv("VIRTUAL_ENV")))
+
+	def _stagePythonPackages(self, packagesPath):
+		""" Place the Python packages in the staging directory, without the files Lambda does not need
+		"""
+		# Get the slim config
+		slimConfig = ConfigurationTool.getConfig(ConfigKey.SLIM)
+
+		# Check if slimming is disabled
+		if slimConfig is False:
+			StagingTool.stageFolder(packagesPath, self.location, link=self._useLinks())
+			return
+
+		# Stage the files we keep
+		files, removedBytes = SlimTool.listFiles(packagesPath, slimConfig)
+		StagingTool.stage(files, self.location, link=self._useLinks())
 
-		# Check Python 'requirements.txt'
-		if os.path.exists("requirements.txt") is True:
-			subprocess.check_call("pip install -r requirements.txt -t %s" % self.location, shell=True)
+		# Strip the shared libraries
+		if slimConfig is None or slimConfig is True or slimConfig.get("strip", True) is True:
+			libraries = [os.path.join(self.location, relativePath) for path, relativePath in files if SlimTool.isLibrary(path) is True and os.path.isdir(path) is False]
+			removedBytes += SlimTool.stripLibraries(libraries)
 
-		# Check Python 'poetry.lock'
-		if os.path.exists("poetry.lock") is True:
-			subprocess.check_call("poetry install", shell=True)
-			os.environ["VIRTUAL_ENV"] = os.popen("poetry env info -p").read().strip()
+		# Remember how much we removed
+		self.slimmedBytes += removedBytes
 
-		# Check Python virtualenv
-		if os.getenv("VIRTUAL_ENV") is not None:
-			packagesPath = os.path.join(os.getenv("VIRTUAL_ENV"), "lib", "python%i.%i" % (sys.version_info[0], sys.version_info[1]), "site-packages")
-			subprocess.check_call("cp -R %s/. %s/" % (packagesPath, self.location), shell=True)
+	def _getDependencies(self, name, lockFiles, install):
+		""" Get the installed dependencies from the cache, install them when they are not cached
+
+			Parameters:
+				name: Name of the package manager
+				lockFiles: The files which decide which dependencies are installed
+				install: Function which installs the dependencies in a directory
+
+			Returns path to the installed dependencies
+		"""
+		# Check if the cache is disabled
+		if ConfigurationTool.getConfig(ConfigKey.DEPENDENCY_CACHE) is False:
+			path = self._createTempPath()
+			install(path)
+			return path
+
+		# Check if the dependencies are cached
+		path = CacheTool.getDependencyPath(name, lockFiles)
+		if os.path.exists(path) is True:
+			return path
+
+		# Install the dependencies and store them
+		buildPath = CacheTool.createDependencyBuildPath(path)
+		try:
+			install(buildPath)
+		except Exception:
+			shutil.rmtree(buildPath, ignore_errors=True)
+			raise
+		CacheTool.storeDependencies(buildPath, path)
+
+		return path
+
+	def _installNodeDependencies(self, path):
+		""" Install the NodeJS dependencies in a directory
+		"""
+		# Copy the package files
+		for fileName in ["package.json", "package-lock.json", "npm-shrinkwrap.json", ".npmrc"]:
+			if os.path.exists(fileName) is True:
+				shutil.copy(fileName, os.path.join(path, fileName))
+
+		subprocess.check_call("npm install --production --ignore-scripts --no-audit --prefix %s" % path, shell=True)
+
+	def _installPipDependencies(self, path):
+		""" Install the Python requirements in a directory
+		"""
+		subprocess.check_call("pip install -r requirements.txt -t %s" % path, shell=True)
+
+	def _installPoetryDependencies(self, path):
+		""" Install the Poetry dependencies and copy them to a directory
+		"""
+		# Install in the virtualenv of poetry
+		subprocess.check_call("poetry install", shell=True)
+		virtualEnv = os.popen("poetry env info -p").read().strip()
+
+		# Copy the packages
+		os.rmdir(path)
+		shutil.copytree(self._getSitePackagesPath(virtualEnv), path, symlinks=True)
+
+	def _getSitePackagesPath(self, virtualEnv):
+		""" Get the site-packages directory of a virtualenv
+
+			Returns path
+		"""
+		return os.path.join(virtualEnv, "lib", "python%i.%i" % (sys.version_info[0], sys.version_info[1]), "site-packages")
+
+	def _createTempPath(self):
+		""" Create a temporary directory, it is removed by removeTempDirs
+
+			Returns path
+		"""
+		path = tempfile.mkdtemp(prefix="pete_")
+		self.tempDirs.append(path)
+		return path
+
+	def _useLinks(self):
+		""" Check if the staging may use copy-on-write clones instead of copies
+
+			Returns boolean
+		"""
+		return ConfigurationTool.getConfig(ConfigKey.STAGING) != "copy"
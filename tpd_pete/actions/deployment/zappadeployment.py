@@ -5,6 +5,7 @@ from halo import Halo
 from termcolor import cprint as print
 
 from ...tools.configuration import ConfigurationTool
+from ...tools.timing import TimingTool
 from .ideploymentaction import IDeploymentAction
 
 
@@ -53,21 +54,23 @@ class ZappaDeployment(IDeploymentAction):
 			if zappaCommand is None:
 				raise Exception("Could not find Zappa. Make sure it is installed.")
 
-			# Run the deployment command
-			try:
-				subprocess.check_output("cd %s && %s deploy %s" % (self.location, zappaCommand, stageName), stderr=subprocess.STDOUT, shell=True)
-			except subprocess.CalledProcessError as e:
-				# Check if it was already deployed
-				if b"did you mean to call update" in e.output:
-					# Run the update command
-					try:
-						subprocess.check_output("cd %s && %s update %s" % (self.location, zappaCommand, stageName), stderr=subprocess.STDOUT, shell=True)
-					except subprocess.CalledProcessError as e:
-						print(e.output, "red")
+			# Record how long zappa takes
+			with TimingTool.phase("zappa", stage=stageName):
+				# Run the deployment command
+				try:
+					subprocess.check_output("cd %s && %s deploy %s" % (self.location, zappaCommand, stageName), stderr=subprocess.STDOUT, shell=True)
+				except subprocess.CalledProcessError as e:
+					# Check if it was already deployed
+					if b"did you mean to call update" in e.output:
+						# Run the update command
+						try:
+							subprocess.check_output("cd %s && %s update %s" % (self.location, zappaCommand, stageName), stderr=subprocess.STDOUT, shell=True)
+						except subprocess.CalledProcessError as e:
+							print(e.output, "red")
+							return False
+					else:
+						print("An error occured", "red")
 						return False
-				else:
-					print("An error occured", "red")
-					return False
 
 	def _findZappa(self):
 		""" Search for Zappa
@@ -3,10 +3,7 @@ import sys
 from termcolor import cprint as print
 
 from .iaction import IAction
-from .deployment.cloudformationdeployment import CloudFormationDeployment
-from .deployment.amplifydeployment import AmplifyDeployment
-from .deployment.hookdeployment import HookDeployment
-from .deployment.zappadeployment import ZappaDeployment
+from ..tools.configuration import ConfigurationTool, ConfigKey
 from .deployment.ideploymentaction import EnvironmentEnum
 
 
@@ -26,14 +23,37 @@ class DeploymentAction(IAction):
 	def start(self, **kwargs):
 		""" Start the deployment
 		"""
+		# Check if we deploy to the matrix, only CloudFormation supports it
+		if kwargs.get('matrix') is True:
+			if os.path.exists("template.yaml") is False:
+				print("The matrix can only be deployed with CloudFormation, could not find 'template.yaml'", "red")
+				sys.exit(1)
+
+			print("Starting CloudFormation matrix deployment", "blue")
+			from .deployment.cloudformationdeployment import CloudFormationDeployment
+			deployment = CloudFormationDeployment()
+			try:
+				result = deployment.startMatrix(**kwargs)
+			finally:
+				deployment.removeTempDirs()
+			if result is False:
+				sys.exit(1)
+			return
+
 		# Remember if we found a deployment option
 		found = False
 		error = False
 
-		# Check if there is an template
-		if os.path.exists("template.yaml") is True:
+		# Check if there is an template, or a project with multiple stacks
+		ConfigurationTool.readConfig()
+		if os.path.exists("template.yaml") is True or ConfigurationTool.getConfig(ConfigKey.STACKS) is not None:
 			print("Starting CloudFormation deployment", "blue")
-			result = CloudFormationDeployment().start(**kwargs)
+			from .deployment.cloudformationdeployment import CloudFormationDeployment
+			deployment = CloudFormationDeployment()
+			try:
+				result = deployment.start(**kwargs)
+			finally:
+				deployment.removeTempDirs()
 			if result is False:
 				error = True
 			found = True
@@ -41,7 +61,12 @@ class DeploymentAction(IAction):
 		# Check if there is an amplify folder
 		if os.path.exists("amplify") is True:
 			print("Starting Amplify deployment", "blue")
-			result = AmplifyDeployment().start(**kwargs)
+			from .deployment.amplifydeployment import AmplifyDeployment
+			deployment = AmplifyDeployment()
+			try:
+				result = deployment.start(**kwargs)
+			finally:
+				deployment.removeTempDirs()
 			if result is False:
 				error = True
 			found = True
@@ -49,7 +74,12 @@ class DeploymentAction(IAction):
 		# Check if there is an zappa folder
 		if os.path.exists("zappa_settings.json") is True:
 			print("Starting Zappa deployment", "blue")
-			result = ZappaDeployment().start(**kwargs)
+			from .deployment.zappadeployment import ZappaDeployment
+			deployment = ZappaDeployment()
+			try:
+				result = deployment.start(**kwargs)
+			finally:
+				deployment.removeTempDirs()
 			if result is False:
 				error = True
 			found = True
@@ -57,6 +87,7 @@ class DeploymentAction(IAction):
 		# Check if there are any custom hooks
 		if os.path.exists(".pete/hooks") is True:
 			print("Starting Custom hooks deployment", "blue")
+			from .deployment.hookdeployment import HookDeployment
 			result = HookDeployment().start(**kwargs)
 			if result is False:
 				error = True
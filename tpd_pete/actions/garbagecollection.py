@@ -0,0 +1,49 @@
+from termcolor import cprint as print
+
+from .iaction import IAction
+from .deployment.cloudformationdeployment import CloudFormationDeployment
+from .deployment.ideploymentaction import EnvironmentEnum
+from ..tools.boto import BotoTool
+from ..tools.configuration import ConfigurationTool
+
+
+class GarbageCollectionAction(IAction):
+	""" The garbage collection action
+	"""
+
+	def start(self, **kwargs):
+		""" Remove the old artifacts from the deployment bucket
+		"""
+		# Get the configs
+		ConfigurationTool.readConfig()
+
+		# Get the deployment of the environment
+		deployment = CloudFormationDeployment()
+		if kwargs['production'] is True:
+			deployment.environment = EnvironmentEnum.PRODUCTION
+
+		# Find the old artifacts
+		bucketName = deployment._getDeploymentBucketName()
+		keys = deployment.collectGarbage(keep=kwargs['keep'])
+
+		# Check if there is anything to remove
+		if len(keys) == 0:
+			print("There are no old artifacts in %s" % bucketName, "yellow")
+			return
+
+		# Show the artifacts
+		for key in keys:
+			print("  %s" % key)
+
+		# Ask to remove them
+		if self._askConfirm("Do you want to remove these %i objects from %s?" % (len(keys), bucketName)) is False:
+			return
+
+		# Remove the objects
+		BotoTool.deleteFromS3(
+			bucket=bucketName,
+			keys=keys,
+			region=deployment._getDeploymentRegion(),
+			profile=deployment._getDeploymentProfile()
+		)
+		print("Removed %i objects from %s" % (len(keys), bucketName), "yellow")
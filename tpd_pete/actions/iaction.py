@@ -7,6 +7,12 @@ from ..tools.awscli import AWSCliTool
 
 
 class IAction(object):
+	# Number of choices after which the list is searched first
+	SEARCH_THRESHOLD = 20
+
+	# Choice to request a list again
+	REFRESH_CHOICE = "(Refresh the list)"
+
 	def start(self, **kwargs):
 		pass
 
@@ -21,19 +27,7 @@ class IAction(object):
 			raise Exception("To use Pete, first setup AWS Cli by using: `aws configure`")
 
 		# Ask the question
-		answer = prompt({
-			"type": "list",
-			"name": "profile",
-			"choices": profiles,
-			"message": "Which profile do you want to use?",
-			"default": default if default is not None else ""
-		})
-
-		# Check if there is an answer
-		if answer == {}:
-			sys.exit()
-
-		return answer['profile']
+		return self._askChoice("Which profile do you want to use?", profiles, default=default)
 
 	def _askS3Bucket(self, profile, default=None):
 		""" Ask for an S3 Bucket
@@ -48,19 +42,80 @@ class IAction(object):
 			return self._askName()
 
 		# Ask the question
-		answer = prompt({
-			"type": "list",
-			"name": "bucket",
-			"choices": buckets,
-			"message": "Which bucket do you want to use?",
-			"default": default if default is not None else ""
-		})
-
-		# Check if there is an answer
-		if answer == {}:
-			sys.exit()
-
-		return answer['bucket']
+		return self._askChoice(
+			"Which bucket do you want to use?",
+			buckets,
+			default=default,
+			refresh=lambda: AWSCliTool.getS3Buckets(profile=profile, refresh=True)
+		)
+
+	def _askChoice(self, message, choices, default=None, refresh=None):
+		""" Ask to pick a choice, long lists are searched first
+
+			Parameters:
+				message: The question
+				choices: List of the choices
+				default: The choice to select first
+				refresh: Function which requests the choices again
+
+			Returns the choice
+		"""
+		while True:
+			# Search long lists
+			found = choices
+			if len(choices) > self.SEARCH_THRESHOLD:
+				found = self._searchChoices(choices)
+
+			# Add the refresh option
+			options = list(found)
+			if refresh is not None:
+				options.append(self.REFRESH_CHOICE)
+
+			# Ask the question
+			answer = prompt({
+				"type": "list",
+				"name": "choice",
+				"choices": options,
+				"message": message,
+				"default": default if default in found else ""
+			})
+
+			# Check if there is an answer
+			if answer == {}:
+				sys.exit()
+
+			# Check if the list should be requested again
+			if answer['choice'] == self.REFRESH_CHOICE:
+				choices = refresh()
+				continue
+
+			return answer['choice']
+
+	def _searchChoices(self, choices):
+		""" Ask for a search term to narrow down a long list of choices
+
+			Returns list with the matching choices
+		"""
+		while True:
+			# Ask the search term
+			answer = prompt({
+				"type": "input",
+				"name": "search",
+				"message": "There are %i choices, type a part of the name to search (leave empty to show all):" % len(choices)
+			})
+
+			# Check if there is an answer
+			if answer == {}:
+				sys.exit()
+
+			# Find the matching choices
+			search = answer['search'].strip().lower()
+			found = [choice for choice in choices if search in choice.lower()]
+
+			# Check if anything matches
+			if len(found) > 0:
+				return found
+			print("Nothing matches '%s', try again." % search, "yellow")
 
 	def _askName(self, default=None):
 		""" Ask for a name
@@ -101,6 +156,21 @@ class IAction(object):
 		if answer['override'] is False:
 			return None
 
+		# Get the regions of the profile
+		try:
+			regions = AWSCliTool.getRegions(profile=profile)
+		except Exception:
+			regions = []
+
+		# Ask to pick a region
+		if len(regions) > 0:
+			return self._askChoice(
+				"What region do you want to use?",
+				sorted(regions),
+				default=default,
+				refresh=lambda: sorted(AWSCliTool.getRegions(profile=profile, refresh=True))
+			)
+
 		# Ask for the region
 		answer = prompt({
 			"type": "input",
@@ -0,0 +1,22 @@
+import sys
+from termcolor import cprint as print
+
+from .iaction import IAction
+from .deployment.cloudformationdeployment import CloudFormationDeployment
+
+
+class PlanAction(IAction):
+	""" The plan action
+	"""
+
+	def start(self, **kwargs):
+		""" Create the change sets, without executing them
+		"""
+		print("Planning CloudFormation deployment", "blue")
+		deployment = CloudFormationDeployment()
+		try:
+			result = deployment.startPlan(**kwargs)
+		finally:
+			deployment.removeTempDirs()
+		if result is False:
+			sys.exit(1)
@@ -1,7 +1,7 @@
 import argparse
 import platform
 
-from .actionmanager import ActionManager
+from .tools.timing import TimingTool
 from .validator import Validator
 
 
@@ -19,9 +19,14 @@ class Pete(object):
 		"""
 		# Create an argument parser
 		parser = argparse.ArgumentParser(prog="pete", description="TPD Pete is an AWS deployment tool for AWS Cloudformation")
-		parser.add_argument("mode", choices=["configure", "init", "deploy"], help="Select a mode")
+		parser.add_argument("mode", choices=["configure", "init", "deploy", "plan", "apply", "gc"], help="Select a mode")
 		parser.add_argument("--production", help="Deploy a project to your production AWS profile", action="store_true")
 		parser.add_argument("--local", help="Override project setup with local development overrides", action="store_true")
+		parser.add_argument("--matrix", help="Deploy one build to all the targets of the matrix in the project config", action="store_true")
+		parser.add_argument("--discard", help="Remove the change sets after showing the plan", action="store_true")
+		parser.add_argument("--keep", help="Number of old artifacts to keep when using the gc mode", type=int, default=10)
+		parser.add_argument("--timings", help="Save how long every phase took, as JSON and as a Chrome trace", nargs="?", const="pete-timings.json", metavar="PATH")
+		parser.add_argument("--profile", help="Save a cProfile dump of pete itself", nargs="?", const="pete.prof", metavar="PATH")
 
 		# Create a argparse group with the modes
 		# modeGroup = parser.add_argument_group("Choices of modes")
@@ -32,6 +37,35 @@ class Pete(object):
 		# Parse the arguments
 		args = parser.parse_args()
 
+		# Start the timers
+		TimingTool.start()
+
+		# Check if we should profile pete
+		profiler = None
+		if args.profile is not None:
+			import cProfile
+			profiler = cProfile.Profile()
+			profiler.enable()
+
+		try:
+			return self._startMode(args)
+		finally:
+			# Save the profile
+			if profiler is not None:
+				profiler.disable()
+				profiler.dump_stats(args.profile)
+				print("Saved the profile to %s" % args.profile)
+
+			# Save the timings
+			if args.timings is not None:
+				self._saveTimings(args.timings)
+
+	def _startMode(self, args):
+		""" Start the selected mode
+		"""
+		# Load the actions, after the arguments are valid
+		from .actionmanager import ActionManager
+
 		# Check if we used the configure mode
 		if args.mode == "configure":
 			return ActionManager.configure()
@@ -50,4 +84,29 @@ class Pete(object):
 
 		# Check if we used the deploy mode
 		if args.mode == "deploy":
-			return ActionManager.deploy(production=args.production)
+			return ActionManager.deploy(production=args.production, matrix=args.matrix)
+
+		# Check if we used the plan mode
+		if args.mode == "plan":
+			return ActionManager.plan(production=args.production, matrix=args.matrix, discard=args.discard)
+
+		# Check if we used the apply mode
+		if args.mode == "apply":
+			return ActionManager.apply()
+
+		# Check if we used the gc mode
+		if args.mode == "gc":
+			return ActionManager.collectGarbage(production=args.production, keep=args.keep)
+
+	def _saveTimings(self, path):
+		""" Save and show how long every phase took
+		"""
+		# Save the timings
+		summaryPath, tracePath = TimingTool.save(path)
+
+		# Show the time per phase
+		summary = TimingTool.getSummary()
+		print("Timings (total %.1fs):" % summary["total"])
+		for name, phase in summary["totals"].items():
+			print("  %-24s %8.2fs%s" % (name, phase["seconds"], " (%ix)" % phase["count"] if phase["count"] > 1 else ""))
+		print("Saved the timings to %s and %s" % (summaryPath, tracePath))
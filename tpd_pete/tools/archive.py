@@ -0,0 +1,632 @@
+import os
+import stat
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ZipWriter(object):
+	""" Write a zip file of already compressed members
+
+		Only writes forward, so the zip can also be written to a stream
+	"""
+
+	# Compression methods
+	STORED = 0
+	DEFLATED = 8
+
+	# Limits of the zip format without the ZIP64 extension
+	ZIP64_LIMIT = 0xFFFFFFFF
+	ZIP64_COUNT_LIMIT = 0xFFFF
+
+	def __init__(self, fileObject):
+		""" Start a new zip
+		"""
+		self.fileObject = fileObject
+		self.offset = 0
+		self.entries = []
+
+	def writeEntry(self, arcname, data, crc, size, method, dateTime, mode):
+		""" Write a member to the zip
+
+			Parameters:
+				arcname: Name of the file in the zip
+				data: The (compressed) content
+				crc: CRC32 of the uncompressed content
+				size: Size of the uncompressed content
+				method: STORED or DEFLATED
+				dateTime: Tuple (year, month, day, hour, minute, second)
+				mode: The file mode
+		"""
+		# Encode the name
+		name = arcname.replace(os.sep, "/").encode("utf-8")
+
+		# Check if we need the ZIP64 extension
+		zip64 = size > self.ZIP64_LIMIT or len(data) > self.ZIP64_LIMIT
+		extra = b""
+		if zip64 is True:
+			extra = struct.pack("<HHQQ", 1, 16, size, len(data))
+
+		# Create the local header
+		dosTime, dosDate = self._getDosTime(dateTime)
+		header = struct.pack(
+			"<IHHHHHIIIHH",
+			0x04034b50,
+			45 if zip64 is True else 20,
+			0x800,
+			method,
+			dosTime,
+			dosDate,
+			crc,
+			self.ZIP64_LIMIT if zip64 is True else len(data),
+			self.ZIP64_LIMIT if zip64 is True else size,
+			len(name),
+			len(extra)
+		)
+
+		# Remember the entry for the central directory
+		self.entries.append({
+			"name": name,
+			"flags": 0x800,
+			"crc": crc,
+			"size": size,
+			"compressedSize": len(data),
+			"method": method,
+			"dosTime": dosTime,
+			"dosDate": dosDate,
+			"mode": mode,
+			"offset": self.offset
+		})
+
+		# Write the member
+		self._write(header + name + extra)
+		self._write(data)
+
+	def writeStreamedEntry(self, arcname, chunks, size, method, dateTime, mode, crc=None):
+		""" Write a member chunk by chunk, so its content is never in memory at once
+
+			Without a CRC32 up front, the CRC32 and the compressed size follow the content in a data descriptor
+
+			Parameters:
+				arcname: Name of the file in the zip
+				chunks: Iterator of tuples (content, data) with an uncompressed chunk and its (compressed) data
+				size: Size of the uncompressed content
+				method: STORED or DEFLATED
+				dateTime: Tuple (year, month, day, hour, minute, second)
+				mode: The file mode
+				crc: CRC32 of the uncompressed content, for a STORED member
+
+			Returns the number of bytes of (compressed) data
+		"""
+		# Encode the name
+		name = arcname.replace(os.sep, "/").encode("utf-8")
+		descriptor = crc is None
+
+		# Check if we need the ZIP64 extension, deflate makes content which does not compress a little larger
+		zip64 = size + size // 100 + 1024 > self.ZIP64_LIMIT
+		headerSize = 0 if descriptor is True else size
+		extra = b""
+		if zip64 is True:
+			extra = struct.pack("<HHQQ", 1, 16, headerSize, headerSize)
+
+		# Create the local header
+		dosTime, dosDate = self._getDosTime(dateTime)
+		flags = 0x808 if descriptor is True else 0x800
+		header = struct.pack(
+			"<IHHHHHIIIHH",
+			0x04034b50,
+			45 if zip64 is True else 20,
+			flags,
+			method,
+			dosTime,
+			dosDate,
+			crc if crc is not None else 0,
+			self.ZIP64_LIMIT if zip64 is True else headerSize,
+			self.ZIP64_LIMIT if zip64 is True else headerSize,
+			len(name),
+			len(extra)
+		)
+		offset = self.offset
+		self._write(header + name + extra)
+
+		# Write the content
+		contentCrc = 0
+		contentSize = 0
+		dataSize = 0
+		for content, data in chunks:
+			contentCrc = zlib.crc32(content, contentCrc)
+			contentSize += len(content)
+			dataSize += len(data)
+			self._write(data)
+
+		# Check if the file changed while it was written
+		if contentSize != size or (crc is not None and contentCrc != crc):
+			raise Exception("The file '%s' changed while it was zipped" % arcname)
+
+		# Write the data descriptor
+		if descriptor is True:
+			self._write(struct.pack("<IIQQ" if zip64 is True else "<IIII", 0x08074b50, contentCrc, dataSize, contentSize))
+
+		# Remember the entry for the central directory
+		self.entries.append({
+			"name": name,
+			"flags": flags,
+			"crc": contentCrc,
+			"size": contentSize,
+			"compressedSize": dataSize,
+			"method": method,
+			"dosTime": dosTime,
+			"dosDate": dosDate,
+			"mode": mode,
+			"offset": offset
+		})
+
+		return dataSize
+
+	def close(self):
+		""" Write the central directory
+		"""
+		# Remember where the central directory starts
+		centralOffset = self.offset
+
+		# Write the central directory
+		for entry in self.entries:
+			# Add the ZIP64 fields which do not fit
+			zip64Fields = []
+			size = entry["size"]
+			compressedSize = entry["compressedSize"]
+			offset = entry["offset"]
+			if size > self.ZIP64_LIMIT:
+				zip64Fields.append(size)
+				size = self.ZIP64_LIMIT
+			if compressedSize > self.ZIP64_LIMIT:
+				zip64Fields.append(compressedSize)
+				compressedSize = self.ZIP64_LIMIT
+			if offset > self.ZIP64_LIMIT:
+				zip64Fields.append(offset)
+				offset = self.ZIP64_LIMIT
+			extra = b""
+			if len(zip64Fields) > 0:
+				extra = struct.pack("<HH" + "Q" * len(zip64Fields), 1, 8 * len(zip64Fields), *zip64Fields)
+
+			# Create the header
+			header = struct.pack(
+				"<IHHHHHHIIIHHHHHII",
+				0x02014b50,
+				0x031e,
+				45 if len(extra) > 0 else 20,
+				entry["flags"],
+				entry["method"],
+				entry["dosTime"],
+				entry["dosDate"],
+				entry["crc"],
+				compressedSize,
+				size,
+				len(entry["name"]),
+				len(extra),
+				0,
+				0,
+				0,
+				(entry["mode"] & 0xFFFF) << 16,
+				offset
+			)
+			self._write(header + entry["name"] + extra)
+
+		# Get the size of the central directory
+		centralSize = self.offset - centralOffset
+		count = len(self.entries)
+
+		# Check if we need the ZIP64 end of central directory
+		if count > self.ZIP64_COUNT_LIMIT or centralOffset > self.ZIP64_LIMIT or centralSize > self.ZIP64_LIMIT:
+			# Write the ZIP64 end of central directory record and locator
+			zip64Offset = self.offset
+			self._write(struct.pack("<IQHHIIQQQQ", 0x06064b50, 44, 45, 45, 0, 0, count, count, centralSize, centralOffset))
+			self._write(struct.pack("<IIQI", 0x07064b50, 0, zip64Offset, 1))
+
+			# Point the normal record to the ZIP64 record
+			count = min(count, self.ZIP64_COUNT_LIMIT)
+			centralSize = min(centralSize, self.ZIP64_LIMIT)
+			centralOffset = min(centralOffset, self.ZIP64_LIMIT)
+
+		# Write the end of central directory
+		self._write(struct.pack("<IHHHHIIH", 0x06054b50, 0, 0, count, count, centralSize, centralOffset, 0))
+
+	def _write(self, data):
+		""" Write data to the file
+		"""
+		self.fileObject.write(data)
+		self.offset += len(data)
+
+	def _getDosTime(self, dateTime):
+		""" Change a date time tuple to the DOS format
+
+			Returns tuple (dosTime, dosDate)
+		"""
+		# The zip format can not store dates before 1980
+		if dateTime[0] < 1980:
+			dateTime = (1980, 1, 1, 0, 0, 0)
+
+		dosTime = (dateTime[3] << 11) | (dateTime[4] << 5) | (dateTime[5] // 2)
+		dosDate = ((dateTime[0] - 1980) << 9) | (dateTime[1] << 5) | dateTime[2]
+		return (dosTime, dosDate)
+
+
+class CompressionPolicy(object):
+	""" Decide how every file in the zip is compressed
+	"""
+
+	# Extensions of files which are already compressed
+	STORE_EXTENSIONS = [
+		".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif",
+		".mp3", ".mp4", ".m4a", ".ogg", ".webm",
+		".woff", ".woff2",
+		".gz", ".tgz", ".bz2", ".xz", ".zst", ".br", ".7z", ".zip",
+		".whl", ".jar", ".egg"
+	]
+
+	def __init__(self, level=6, storeExtensions=None, minSize=0):
+		""" Create the policy
+
+			Parameters:
+				level: The deflate level
+				storeExtensions: Extensions of the files which are stored without compression
+				minSize: Files smaller than this number of bytes are stored without compression
+		"""
+		self.level = level
+		self.storeExtensions = set(extension.lower() for extension in (storeExtensions if storeExtensions is not None else self.STORE_EXTENSIONS))
+		self.minSize = minSize
+
+	@classmethod
+	def fromConfig(cls, config):
+		""" Create the policy from the compression config
+
+			The config can contain "level", "store" with extra extensions, "deflate" with extensions to
+			compress anyway and "min-size"
+
+			Returns a CompressionPolicy
+		"""
+		# Check if there is a config
+		if config is None:
+			config = {}
+
+		# Get the extensions
+		storeExtensions = set(cls.STORE_EXTENSIONS) | set(config.get("store", []))
+		storeExtensions = storeExtensions - set(config.get("deflate", []))
+
+		return cls(
+			level=int(config.get("level", 6)),
+			storeExtensions=storeExtensions,
+			minSize=int(config.get("min-size", 0))
+		)
+
+	def shouldStore(self, arcname, size):
+		""" Check if a file should be stored without compression
+
+			Returns boolean
+		"""
+		# Level 0 is no compression at all
+		if self.level == 0:
+			return True
+
+		# Check the size
+		if size < self.minSize:
+			return True
+
+		# Check the extension
+		return os.path.splitext(arcname)[1].lower() in self.storeExtensions
+
+
+class ArchiveTool(object):
+	# Number of files to compress in a single task
+	BATCH_FILES = 64
+
+	# Number of bytes to compress in a single task
+	BATCH_BYTES = 4 * 1024 * 1024
+
+	# Number of bytes which are read, compressed or waiting to be written at the same time
+	PENDING_BYTES = 64 * 1024 * 1024
+
+	# Files of this number of bytes or more are compressed in chunks by the main process
+	LARGE_FILE_BYTES = 16 * 1024 * 1024
+
+	# Number of bytes of a large file which are read at once
+	CHUNK_BYTES = 1024 * 1024
+
+	@classmethod
+	def createZip(cls, files, fileObject, workers=None, policy=None, reproducible=False):
+		""" Create a zip, the files are compressed by a pool of processes
+
+			Parameters:
+				files: List of tuples (path, arcname), the order of the zip
+				fileObject: File or stream to write the zip to
+				workers: Number of processes, defaults to the number of cores
+				policy: The CompressionPolicy
+				reproducible: Create the same bytes for the same content
+
+			Returns dict with the statistics
+		"""
+		# Get the number of workers
+		if workers is None:
+			workers = os.cpu_count() or 1
+
+		# Get the policy
+		if policy is None:
+			policy = CompressionPolicy()
+
+		# Check if the zip should be reproducible
+		fixedTime = None
+		if reproducible is True:
+			# Sort the entries and use a single timestamp for all of them
+			files = sorted(files, key=lambda item: item[1])
+			fixedTime = cls._getReproducibleTime()
+
+		# Create the writer and the statistics
+		writer = ZipWriter(fileObject)
+		statistics = {"files": 0, "bytesIn": 0, "bytesOut": 0, "storedFiles": 0, "storedBytes": 0, "deflatedBytes": 0, "deflateSeconds": 0.0}
+
+		# Create the batches
+		batches = cls._createBatches(files)
+
+		# Check if it is worth starting processes
+		if workers <= 1 or len(batches) <= 1:
+			for batch, batchSize, large in batches:
+				if large is True:
+					cls._writeLargeFile(writer, statistics, batch[0], policy, fixedTime)
+				else:
+					cls._writeBatch(writer, statistics, cls._compressBatch(batch, policy, fixedTime))
+
+		else:
+			with ProcessPoolExecutor(max_workers=workers) as executor:
+				# Keep a limited number of bytes in progress, so the memory stays limited
+				pending = deque()
+				pendingBytes = 0
+				for batch, batchSize, large in batches:
+					# Write all the batches before a large file, it is written in chunks right away
+					if large is True:
+						while len(pending) > 0:
+							cls._writeBatch(writer, statistics, pending.popleft()[0].result())
+						pendingBytes = 0
+						cls._writeLargeFile(writer, statistics, batch[0], policy, fixedTime)
+						continue
+
+					# Write the oldest batches until the window has room
+					while len(pending) > 0 and (len(pending) >= workers * 4 or pendingBytes + batchSize > cls.PENDING_BYTES):
+						future, size = pending.popleft()
+						cls._writeBatch(writer, statistics, future.result())
+						pendingBytes -= size
+
+					pending.append((executor.submit(cls._compressBatch, batch, policy, fixedTime), batchSize))
+					pendingBytes += batchSize
+
+				# Write the remaining batches in order
+				while len(pending) > 0:
+					cls._writeBatch(writer, statistics, pending.popleft()[0].result())
+
+		# Write the central directory
+		writer.close()
+
+		return statistics
+
+	@classmethod
+	def getSummary(cls, statistics):
+		""" Create a readable summary of the zip statistics
+
+			Returns a string
+		"""
+		# Create the summary
+		summary = "Zipped %i files, %s to %s" % (statistics["files"], cls._formatSize(statistics["bytesIn"]), cls._formatSize(statistics["bytesOut"]))
+
+		# Add the files which were not compressed
+		if statistics["storedFiles"] > 0:
+			summary += ", %i files (%s) stored without compression" % (statistics["storedFiles"], cls._formatSize(statistics["storedBytes"]))
+
+			# Estimate the time we saved with the speed of the compressed files
+			if statistics["deflateSeconds"] > 0 and statistics["deflatedBytes"] > 0:
+				savedSeconds = statistics["storedBytes"] / (statistics["deflatedBytes"] / statistics["deflateSeconds"])
+				summary += ", saving about %.1fs of compression" % savedSeconds
+
+		return summary
+
+	@classmethod
+	def _formatSize(cls, size):
+		""" Format a number of bytes
+
+			Returns a string
+		"""
+		for unit in ["B", "KB", "MB"]:
+			if size < 1024:
+				return "%.1f %s" % (size, unit)
+			size = size / 1024
+		return "%.1f GB" % size
+
+	@classmethod
+	def _writeBatch(cls, writer, statistics, result):
+		""" Write a compressed batch to the zip
+		"""
+		entries, batchStatistics = result
+
+		# Write the entries
+		for entry in entries:
+			writer.writeEntry(**entry)
+
+		# Add the statistics
+		for key in batchStatistics:
+			statistics[key] += batchStatistics[key]
+
+	@classmethod
+	def _writeLargeFile(cls, writer, statistics, item, policy, fixedTime=None):
+		""" Compress a large file in chunks and write it to the zip
+
+			A large file which should be compressed is always deflated, the size is only known afterwards
+
+			Parameters:
+				item: Tuple (path, arcname)
+		"""
+		path, arcname = item
+		fileStat = os.stat(path)
+		size = fileStat.st_size
+		dateTime, mode = cls._getFileTime(fileStat, fixedTime)
+
+		# Read the file in chunks
+		def readChunks():
+			with open(path, "rb") as f:
+				for chunk in iter(lambda: f.read(cls.CHUNK_BYTES), b""):
+					yield chunk
+
+		# Check if the file should be compressed
+		if policy.shouldStore(arcname, size) is True:
+			# Get the CRC32 first, so the stored entry needs no data descriptor
+			crc = 0
+			for chunk in readChunks():
+				crc = zlib.crc32(chunk, crc)
+
+			dataSize = writer.writeStreamedEntry(arcname, ((chunk, chunk) for chunk in readChunks()), size, ZipWriter.STORED, dateTime, mode, crc=crc)
+			statistics["storedFiles"] += 1
+			statistics["storedBytes"] += size
+
+		else:
+			# Compress the chunks, with fixed settings
+			compressor = zlib.compressobj(policy.level, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY)
+
+			def compressChunks():
+				for chunk in readChunks():
+					startTime = time.perf_counter()
+					data = compressor.compress(chunk)
+					statistics["deflateSeconds"] += time.perf_counter() - startTime
+					yield (chunk, data)
+				yield (b"", compressor.flush())
+
+			dataSize = writer.writeStreamedEntry(arcname, compressChunks(), size, ZipWriter.DEFLATED, dateTime, mode)
+			statistics["deflatedBytes"] += size
+
+		statistics["files"] += 1
+		statistics["bytesIn"] += size
+		statistics["bytesOut"] += dataSize
+
+	@classmethod
+	def _createBatches(cls, files):
+		""" Group the files in batches of about the same size, every large file is a batch on its own
+
+			Returns a list of tuples (batch, number of bytes, large)
+		"""
+		batches = []
+		batch = []
+		batchSize = 0
+
+		# Walk through the files
+		for path, arcname in files:
+			size = os.path.getsize(path)
+
+			# Check if this is a large file
+			if size >= cls.LARGE_FILE_BYTES:
+				if len(batch) > 0:
+					batches.append((batch, batchSize, False))
+					batch = []
+					batchSize = 0
+				batches.append(([(path, arcname)], size, True))
+				continue
+
+			# Add the file to the batch
+			batch.append((path, arcname))
+			batchSize += size
+
+			# Check if the batch is full
+			if len(batch) >= cls.BATCH_FILES or batchSize >= cls.BATCH_BYTES:
+				batches.append((batch, batchSize, False))
+				batch = []
+				batchSize = 0
+
+		# Add the last batch
+		if len(batch) > 0:
+			batches.append((batch, batchSize, False))
+
+		return batches
+
+	@classmethod
+	def _getFileTime(cls, fileStat, fixedTime=None):
+		""" Get the time and permissions of a file in the zip
+
+			Returns tuple (dateTime, mode)
+		"""
+		dateTime = time.localtime(fileStat.st_mtime)[0:6]
+		mode = stat.S_IMODE(fileStat.st_mode)
+
+		# Use the fixed time and normalized permissions
+		if fixedTime is not None:
+			dateTime = fixedTime
+			mode = 0o755 if mode & 0o111 else 0o644
+
+		return (dateTime, stat.S_IFREG | mode)
+
+	@classmethod
+	def _getReproducibleTime(cls):
+		""" Get the timestamp for a reproducible zip, SOURCE_DATE_EPOCH when it is set
+
+			Returns a date time tuple
+		"""
+		# Check if there is an environment var
+		if os.getenv("SOURCE_DATE_EPOCH") is not None:
+			return time.gmtime(int(os.getenv("SOURCE_DATE_EPOCH")))[0:6]
+
+		return (1980, 1, 1, 0, 0, 0)
+
+	@classmethod
+	def _compressBatch(cls, batch, policy, fixedTime=None):
+		""" Compress a batch of files
+
+			Parameters:
+				batch: List of tuples (path, arcname)
+				policy: The CompressionPolicy
+				fixedTime: Use this time and normalized permissions for all the files
+
+			Returns tuple (entries, statistics)
+		"""
+		entries = []
+		statistics = {"files": 0, "bytesIn": 0, "bytesOut": 0, "storedFiles": 0, "storedBytes": 0, "deflatedBytes": 0, "deflateSeconds": 0.0}
+
+		# Walk through the files
+		for path, arcname in batch:
+			# Read the file
+			with open(path, "rb") as f:
+				content = f.read()
+
+			# Get the time and permissions
+			dateTime, mode = cls._getFileTime(os.stat(path), fixedTime)
+
+			# Check if the file should be compressed
+			method = ZipWriter.STORED
+			data = content
+			if policy.shouldStore(arcname, len(content)) is True:
+				statistics["storedFiles"] += 1
+				statistics["storedBytes"] += len(content)
+
+			else:
+				# Compress the content, with fixed settings
+				startTime = time.perf_counter()
+				compressor = zlib.compressobj(policy.level, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY)
+				compressed = compressor.compress(content) + compressor.flush()
+				statistics["deflateSeconds"] += time.perf_counter() - startTime
+				statistics["deflatedBytes"] += len(content)
+
+				# Only use the compressed data when it is smaller
+				if len(compressed) < len(content):
+					method = ZipWriter.DEFLATED
+					data = compressed
+
+			statistics["files"] += 1
+			statistics["bytesIn"] += len(content)
+			statistics["bytesOut"] += len(data)
+
+			entries.append({
+				"arcname": arcname,
+				"data": data,
+				"crc": zlib.crc32(content),
+				"size": len(content),
+				"method": method,
+				"dateTime": dateTime,
+				"mode": mode
+			})
+
+		return (entries, statistics)
@@ -1,118 +1,167 @@
-import subprocess
+import configparser
+import os
+
 from .boto import BotoTool
+from .cache import CacheTool
 
 
 class AWSCliTool(object):
+	# Remember the parsed files, by path and modification time
+	_files = {}
+
 	@classmethod
 	def getRegion(cls, profile):
 		""" Get AWS region of a profile
-		"""
-		# Check if the AWS Cli is available
-		if cls.hasAWSCli() is False:
-			# Use boto3
-			return BotoTool.getRegion(profile)
 
-		# Open the AWS configuration
-		command = "cat ~/.aws/config"
+			Returns the region or None
+		"""
+		# Get the AWS configuration
+		config = cls._readFile(cls.getConfigPath())
 
-		# Request the config from AWS Cli
-		result = subprocess.run(command, shell=True, capture_output=True)
+		# Check the profile, then the default profile
+		for sectionName in [cls._getSectionName(profile), "default"]:
+			if config.has_section(sectionName) is True and config.has_option(sectionName, "region") is True:
+				return config.get(sectionName, "region").strip()
 
-		# Check the response
-		if result.returncode != 0:
-			raise Exception("Could not successfully get the profiles from AWS Cli. Has you run `aws configure`?")
+		# Check the environment vars
+		for name in ["AWS_REGION", "AWS_DEFAULT_REGION"]:
+			if name in os.environ:
+				return os.environ[name]
 
-		# Parse the output
-		lines = (result.stdout).decode()
+		return None
 
-		# Remember the region and profile of the config
-		region = None
-		configProfile = None
+	@classmethod
+	def getProfiles(cls):
+		""" Get all AWS profiles
 
-		# Walk throught the lines
-		for line in lines.split("\n"):
-			# Check line length
-			if len(line) == 0:
-				continue
+			Returns list with the profile names
+		"""
+		profiles = []
 
-			# Check if the next lines belong to a profile
-			if line[0] == "[":
-				# Save the config profile
-				configProfile = line[1:-1]
+		# Get the profiles with credentials
+		for sectionName in cls._readFile(cls.getCredentialsPath()).sections():
+			profiles.append(sectionName.strip())
 
-			# Check if this is the region
-			elif line[:6] == "region":
-				# Check the profile
-				if configProfile == "default" and region is None:
-					region = line[9:]
-				elif configProfile == profile:
-					region = line[9:]
+		# Get the profiles in the configuration, like the SSO profiles
+		for sectionName in cls._readFile(cls.getConfigPath()).sections():
+			if sectionName.startswith("profile "):
+				profiles.append(sectionName[8:].strip())
+			elif sectionName == "default":
+				profiles.append(sectionName)
 
-		return region
+		# Remove the duplicates, but keep the order
+		profiles = list(dict.fromkeys(profile for profile in profiles if profile != ""))
 
-	@classmethod
-	def getProfiles(cls):
-		""" Get all AWS profiles
-		"""
-		# Check if the AWS Cli is available
-		if cls.hasAWSCli() is False:
+		# Check if there are profiles
+		if len(profiles) == 0:
 			# Use boto3
 			return BotoTool.getProfiles()
 
-		# Build the command
-		command = "cat ~/.aws/credentials | grep -o '\[[^]]*\]'"
-
-		# Request all the profiles from AWS Cli
-		result = subprocess.run(command, shell=True, capture_output=True)
+		return profiles
 
-		# Check the response
-		if result.returncode != 0:
-			raise Exception("Could not successfully get the profiles from AWS Cli. Has you run `aws configure`?")
+	@classmethod
+	def getRegions(cls, profile=None, refresh=False):
+		""" Get the AWS regions which are enabled for a profile
 
-		# Parse the output
-		output = (result.stdout).decode()
+			Parameters:
+				refresh: Ignore the cached list
 
-		return [(line[1:-1]).strip() for line in output.split("\n")]
+			Returns list with the region names
+		"""
+		return cls._getCachedList("regions", profile, BotoTool.getRegions, refresh)
 
 	@classmethod
-	def getS3Buckets(cls, profile=None):
+	def getS3Buckets(cls, profile=None, refresh=False):
 		""" Get your S3 bucket
+
+			Parameters:
+				refresh: Ignore the cached list
 		"""
-		# Check if the AWS Cli is available
-		if cls.hasAWSCli() is False:
-			# Use boto3
-			return BotoTool.getS3Buckets(profile)
+		try:
+			return cls._getCachedList("buckets", profile, BotoTool.getS3Buckets, refresh)
+		except Exception:
+			raise Exception("Could not successfully get the S3 buckets from AWS. Do you have the right permissions?")
 
-		# Build the command
-		command = "aws s3 ls"
+	@classmethod
+	def getConfigPath(cls):
+		""" Get the path to the AWS configuration
+
+			Returns path
+		"""
+		return os.environ.get("AWS_CONFIG_FILE", os.path.join("~", ".aws", "config"))
+
+	@classmethod
+	def getCredentialsPath(cls):
+		""" Get the path to the AWS credentials
+
+			Returns path
+		"""
+		return os.environ.get("AWS_SHARED_CREDENTIALS_FILE", os.path.join("~", ".aws", "credentials"))
+
+	@classmethod
+	def _getCachedList(cls, name, profile, request, refresh=False):
+		""" Get a list from the cache, or request and cache it
 
-		# Check if there is an profile
-		if profile is not None:
-			command = command + " --profile %s" % profile
+			Parameters:
+				name: Name of the list
+				profile: The profile the list belongs to
+				request: Function which receives the profile and returns the list
+				refresh: Ignore the cached list
 
-		# Execute the command
-		result = subprocess.run(command, shell=True, capture_output=True)
+			Returns the list
+		"""
+		# The list depends on the account of the profile, and on the credential files
+		scope = [profile if profile is not None else "default", os.path.expanduser(cls.getConfigPath()), os.path.expanduser(cls.getCredentialsPath())]
 
-		# Check the response
-		if result.returncode != 0:
-			raise Exception("Could not successfully get the S3 buckets from AWS Cli. Do you have the right permissions?")
+		# Check the cache
+		if refresh is False:
+			values = CacheTool.getList(name, scope)
+			if values is not None:
+				return values
 
-		# Parse the output
-		output = (result.stdout).decode()
+		# Request the list, an empty list is not cached so it is requested again next time
+		values = request(profile)
+		if len(values) > 0:
+			CacheTool.storeList(name, scope, values)
 
-		return [(line[19:]).strip() for line in output.split("\n")]
+		return values
 
 	@classmethod
-	def hasAWSCli(cls):
-		""" Check if the AWS Cli is available
+	def _readFile(cls, path):
+		""" Parse an AWS configuration file
+
+			Returns a ConfigParser, which is empty when the file does not exist
 		"""
-		# Build the command
-		command = "aws help"
+		# Get the real path
+		path = os.path.expanduser(path)
+
+		# Check if the file exists
+		if os.path.exists(path) is False:
+			return configparser.ConfigParser()
+
+		# Check if we parsed this version of the file before
+		modified = os.path.getmtime(path)
+		if path in cls._files and cls._files[path][0] == modified:
+			return cls._files[path][1]
+
+		# Parse the file, the AWS Cli allows duplicates and values with % signs
+		config = configparser.ConfigParser(interpolation=None, strict=False)
+		try:
+			config.read(path)
+		except configparser.Error:
+			raise Exception("Could not read %s. Has you run `aws configure`?" % path)
 
-		# Request the config from AWS Cli
-		result = subprocess.run(command, shell=True, capture_output=True)
+		# Remember the file
+		cls._files[path] = (modified, config)
+
+		return config
+
+	@classmethod
+	def _getSectionName(cls, profile):
+		""" Get the name of the section of a profile in the AWS configuration
+		"""
+		# Check if this is the default profile
+		if profile is None or profile == "default":
+			return "default"
 
-		# Check the response
-		if result.returncode != 0:
-			return False
-		return True
+		return "profile %s" % profile
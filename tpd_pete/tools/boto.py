@@ -1,14 +1,216 @@
+import io
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
+import boto3.session
+import botocore.exceptions
+from boto3.s3.transfer import TransferConfig
+
+
+class UploadProgress(object):
+	""" Follow the progress of an upload, usable as a boto3 callback
+	"""
+
+	# Minimal number of seconds between updates
+	UPDATE_INTERVAL = 0.2
+
+	def __init__(self, onUpdate, totalBytes=None):
+		""" Start following the upload
+
+			Parameters:
+				onUpdate: Function which receives the progress text
+				totalBytes: Size of the upload, when it is known
+		"""
+		self.onUpdate = onUpdate
+		self.totalBytes = totalBytes
+		self.transferredBytes = 0
+		self.startTime = time.monotonic()
+		self.lastUpdate = 0
+		self.lock = threading.Lock()
+
+	def __call__(self, bytesAmount):
+		""" Add transferred bytes, called from the transfer threads
+		"""
+		with self.lock:
+			self.transferredBytes += bytesAmount
+
+			# Check if we should update
+			now = time.monotonic()
+			if now - self.lastUpdate < self.UPDATE_INTERVAL:
+				return
+			self.lastUpdate = now
+
+			self.onUpdate(self.getText())
+
+	def getText(self):
+		""" Get the progress as text
+
+			Returns a string
+		"""
+		# Calculate the throughput
+		seconds = max(time.monotonic() - self.startTime, 0.001)
+		throughput = self.transferredBytes / seconds
+		text = "%.1f MB, %.1f MB/s" % (self.transferredBytes / 1048576, throughput / 1048576)
+
+		# Add the percentage and the time left
+		if self.totalBytes is not None and self.totalBytes > 0:
+			text = "%i%% of %.1f MB, %.1f MB/s" % (min(100, self.transferredBytes * 100 // self.totalBytes), self.totalBytes / 1048576, throughput / 1048576)
+			if throughput > 0:
+				text += ", %is left" % max(0, (self.totalBytes - self.transferredBytes) / throughput)
+
+		return text
+
+
+class S3UploadStream(io.RawIOBase):
+	""" A writable stream which uploads to S3 in concurrent multipart parts
+	"""
+
+	def __init__(self, client, bucket, key, partSize, concurrency, callback=None, maxBandwidth=None):
+		""" Start the multipart upload
+
+			Parameters:
+				callback: Function called with the number of bytes of every uploaded part
+				maxBandwidth: Maximal number of bytes per second, for all the parts together
+		"""
+		super().__init__()
+
+		# Remember the information
+		self.client = client
+		self.callback = callback
+		self.bucket = bucket
+		self.key = key
+		self.partSize = partSize
+		self.position = 0
+		self.buffer = bytearray()
+		self.futures = []
+
+		# Remember when the next part may start, to limit the bandwidth
+		self.maxBandwidth = maxBandwidth
+		self.nextTime = time.monotonic()
+		self.bandwidthLock = threading.Lock()
+
+		# Limit the number of parts in memory
+		self.slots = threading.BoundedSemaphore(concurrency * 2)
+		self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+		# Create the multipart upload
+		self.uploadId = client.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+
+	def writable(self):
+		return True
+
+	def tell(self):
+		return self.position
+
+	def write(self, data):
+		""" Write data to the stream
+		"""
+		# Add the data to the buffer
+		self.buffer.extend(data)
+		self.position += len(data)
+
+		# Send the full parts
+		while len(self.buffer) >= self.partSize:
+			self._sendPart(bytes(self.buffer[:self.partSize]))
+			del self.buffer[:self.partSize]
+
+		return len(data)
+
+	def close(self):
+		""" Send the last part and complete the upload
+		"""
+		# Check if it is already closed
+		if self.closed is True:
+			return
+
+		try:
+			# Send the remaining data, S3 needs at least one part
+			if len(self.buffer) > 0 or len(self.futures) == 0:
+				self._sendPart(bytes(self.buffer))
+				self.buffer = bytearray()
+
+			# Wait for all the parts
+			parts = [future.result() for future in self.futures]
+
+			# Complete the upload
+			self.client.complete_multipart_upload(
+				Bucket=self.bucket,
+				Key=self.key,
+				UploadId=self.uploadId,
+				MultipartUpload={"Parts": parts}
+			)
+		except Exception:
+			self.abort()
+			raise
+		finally:
+			self.executor.shutdown(wait=True)
+			super().close()
+
+	def abort(self):
+		""" Abort the upload and remove the uploaded parts
+		"""
+		# Stop sending parts
+		self.executor.shutdown(wait=True)
+
+		# Abort the upload
+		self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.uploadId)
+		super().close()
+
+	def _sendPart(self, data):
+		""" Send a part in the background
+		"""
+		# Wait for a free slot
+		self.slots.acquire()
+
+		# Upload the part
+		partNumber = len(self.futures) + 1
+		self.futures.append(self.executor.submit(self._uploadPart, partNumber, data))
+
+	def _uploadPart(self, partNumber, data):
+		""" Upload a single part
+
+			Returns dict with the part information
+		"""
+		try:
+			# Wait until the bandwidth allows this part
+			if self.maxBandwidth is not None:
+				with self.bandwidthLock:
+					startTime = max(time.monotonic(), self.nextTime)
+					self.nextTime = startTime + len(data) / self.maxBandwidth
+				time.sleep(max(0, startTime - time.monotonic()))
+
+			response = self.client.upload_part(
+				Bucket=self.bucket,
+				Key=self.key,
+				UploadId=self.uploadId,
+				PartNumber=partNumber,
+				Body=data
+			)
+		finally:
+			self.slots.release()
+
+		# Report the progress
+		if self.callback is not None:
+			self.callback(len(data))
+
+		return {"PartNumber": partNumber, "ETag": response["ETag"]}
 
 
 class BotoTool(object):
+	# Pool of the sessions and clients
+	_sessions = {}
+	_clients = {}
+	_poolLock = threading.RLock()
+
 	@classmethod
-	def getRegions(cls):
+	def getRegions(cls, profile=None):
 		""" Get all AWS regions
 		"""
 		# Get a boto client
-		client = cls._getClient("ec2", region="us-east-1")
+		client = cls._getClient("ec2", region="us-east-1", profile=profile)
 
 		# Retrieve all the regions
 		regions = [region["RegionName"] for region in client.describe_regions()["Regions"]]
@@ -41,28 +243,192 @@ class BotoTool(object):
 		buckets = client.list_buckets()
 
 		# Get the names
-		bucketNames = [bucket["Name"] for bucket in buckets]
+		bucketNames = [bucket["Name"] for bucket in buckets["Buckets"]]
 
 		return bucketNames
 
 	@classmethod
-	def uploadToS3(cls, fromPath, toBucket, toKey, region, profile=None):
+	def uploadToS3(cls, fromPath, toBucket, toKey, region, profile=None, transferConfig=None, callback=None):
 		""" Upload a file to S3
+
+			Parameters:
+				transferConfig: The transfer config, see getTransferSettings
+				callback: Function called with the number of transferred bytes
 		"""
 		# Get a boto3 client
 		client = cls._getClient("s3", region=region, profile=profile)
 
+		# Create the transfer settings
+		settings = cls.getTransferSettings(transferConfig)
+		config = TransferConfig(
+			multipart_threshold=settings["partSize"],
+			multipart_chunksize=settings["partSize"],
+			max_concurrency=settings["concurrency"],
+			max_bandwidth=settings["maxBandwidth"]
+		)
+
 		# Upload the file
-		client.upload_file(fromPath, toBucket, toKey)
+		client.upload_file(fromPath, toBucket, toKey, Config=config, Callback=callback)
 		return "https://%s.s3.%s.amazonaws.com/%s" % (toBucket, region, toKey)
 
+	@classmethod
+	def copyInS3(cls, fromBucket, fromRegion, toBucket, key, region, profile=None, fromProfile=None, transferConfig=None):
+		""" Copy an object to another bucket, the data is copied by S3 itself
+
+			Parameters:
+				fromBucket: Bucket with the object
+				fromRegion: Region of the bucket with the object
+				toBucket: Bucket to copy the object to, with the same key
+				region: Region of the bucket to copy to
+				profile: Profile to copy with, it needs read access to the bucket with the object
+				fromProfile: Profile to read the bucket with the object, defaults to profile
+				transferConfig: The transfer config, see getTransferSettings
+		"""
+		# Get the boto3 clients
+		client = cls._getClient("s3", region=region, profile=profile)
+		sourceClient = cls._getClient("s3", region=fromRegion, profile=fromProfile if fromProfile is not None else profile)
+
+		# Create the transfer settings, large objects are copied in parts
+		settings = cls.getTransferSettings(transferConfig)
+		config = TransferConfig(
+			multipart_threshold=settings["partSize"],
+			multipart_chunksize=settings["partSize"],
+			max_concurrency=settings["concurrency"]
+		)
+
+		# Copy the object
+		client.copy({"Bucket": fromBucket, "Key": key}, toBucket, key, SourceClient=sourceClient, Config=config)
+		return "https://%s.s3.%s.amazonaws.com/%s" % (toBucket, region, key)
+
+	@classmethod
+	def existsInS3(cls, bucket, key, region, profile=None):
+		""" Check if an object exists in S3
+
+			Returns boolean
+		"""
+		# Get a boto3 client
+		client = cls._getClient("s3", region=region, profile=profile)
+
+		# Request the object information
+		try:
+			client.head_object(Bucket=bucket, Key=key)
+		except botocore.exceptions.ClientError as e:
+			# Check if the object does not exist
+			if e.response["Error"]["Code"] in ["404", "NoSuchKey", "NotFound"]:
+				return False
+			raise
+
+		return True
+
+	@classmethod
+	def listS3Objects(cls, bucket, prefix, region, profile=None):
+		""" List the objects in S3 with a prefix
+
+			Returns a list with the object information
+		"""
+		# Get a boto3 client
+		client = cls._getClient("s3", region=region, profile=profile)
+
+		# Walk through the pages
+		objects = []
+		for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+			objects.extend(page.get("Contents", []))
+
+		return objects
+
+	@classmethod
+	def deleteFromS3(cls, bucket, keys, region, profile=None):
+		""" Delete objects from S3
+		"""
+		# Get a boto3 client
+		client = cls._getClient("s3", region=region, profile=profile)
+
+		# S3 deletes at most 1000 objects per request
+		for index in range(0, len(keys), 1000):
+			response = client.delete_objects(
+				Bucket=bucket,
+				Delete={"Objects": [{"Key": key} for key in keys[index:index + 1000]], "Quiet": True}
+			)
+
+			# Check the response
+			if len(response.get("Errors", [])) > 0:
+				raise Exception("Could not delete '%s' from S3: %s" % (response["Errors"][0]["Key"], response["Errors"][0]["Message"]))
+
+	@classmethod
+	def openS3Stream(cls, toBucket, toKey, region, profile=None, transferConfig=None, callback=None):
+		""" Open a stream which uploads to S3 while it is written
+
+			Returns a S3UploadStream
+		"""
+		# Get a boto3 client
+		client = cls._getClient("s3", region=region, profile=profile)
+
+		# Get the transfer settings
+		settings = cls.getTransferSettings(transferConfig)
+
+		return S3UploadStream(client, toBucket, toKey, partSize=settings["partSize"], concurrency=settings["concurrency"], callback=callback, maxBandwidth=settings["maxBandwidth"])
+
+	@classmethod
+	def getTransferSettings(cls, transferConfig=None):
+		""" Get the transfer settings from the transfer config
+
+			The config can contain "concurrency", "part-size" in MB and "max-bandwidth" in MB per second
+
+			Returns a dict
+		"""
+		# Check if there is a config
+		if transferConfig is None:
+			transferConfig = {}
+
+		# S3 does not accept parts smaller than 5 MB
+		partSize = max(5, int(transferConfig.get("part-size", 8))) * 1024 * 1024
+
+		# Get the bandwidth limit
+		maxBandwidth = None
+		if transferConfig.get("max-bandwidth") is not None:
+			maxBandwidth = int(float(transferConfig["max-bandwidth"]) * 1024 * 1024)
+
+		return {
+			"concurrency": int(transferConfig.get("concurrency", 10)),
+			"partSize": partSize,
+			"maxBandwidth": maxBandwidth
+		}
+
 	@classmethod
 	def _getClient(cls, resourceType, region, profile=None):
-		""" Get a Boto3 client
+		""" Get a Boto3 client, clients are shared per profile, region and service
+		"""
+		# Create the key of the client
+		key = (cls._getProfileKey(profile), region, resourceType)
+
+		# Creating clients is not thread safe, so only one thread creates them
+		with cls._poolLock:
+			# Check if the client exists
+			if key not in cls._clients:
+				cls._clients[key] = cls._getSession(profile).client(resourceType, region_name=region)
+
+			return cls._clients[key]
+
+	@classmethod
+	def _getSession(cls, profile=None):
+		""" Get the Boto3 session of a profile
+		"""
+		# Create the key of the session
+		key = cls._getProfileKey(profile)
+
+		with cls._poolLock:
+			# Check if the session exists
+			if key not in cls._sessions:
+				cls._sessions[key] = boto3.session.Session(profile_name=key)
+
+			return cls._sessions[key]
+
+	@classmethod
+	def _getProfileKey(cls, profile):
+		""" Get the name of the profile to use, None is the default profile
 		"""
 		# Check if the profile name is set
-		if profile is not None and profile != "default":
-			# Add the profile name to environment variables
-			os.environ["AWS_PROFILE"] = profile
+		if profile is None or profile == "default":
+			return None
 
-		return boto3.client(resourceType, region_name=region)
+		return profile
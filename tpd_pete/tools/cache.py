@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+class CacheTool(object):
+	# Files which decide which dependencies are installed
+	LOCK_FILES = ["package.json", "package-lock.json", "requirements.txt", "poetry.lock"]
+
+	# Number of artifacts to keep in the cache
+	MAX_ARTIFACTS = 5
+
+	# Number of installed dependencies to keep per package manager and project
+	MAX_DEPENDENCIES = 3
+
+	# Number of days unused dependencies of any project are kept
+	DEPENDENCY_DAYS = 30
+
+	# Number of seconds recently used dependencies are never removed, another deployment may be staging them
+	DEPENDENCY_IN_USE = 15 * 60
+
+	# Size of the blocks to read while hashing
+	BLOCK_SIZE = 1024 * 1024
+
+	# Number of seconds a cached list, like the S3 buckets, is used
+	LIST_TTL = 60 * 60
+
+	@classmethod
+	def fingerprint(cls, files, lockFiles=None):
+		""" Create a content fingerprint of a list of files
+
+			Parameters:
+				files: List of tuples (path, arcname)
+				lockFiles: List of dependency lock files to include
+
+			Returns the fingerprint as a hex string
+		"""
+		# Create the digest
+		digest = hashlib.sha256()
+
+		# Walk through the files in a fixed order, the mode is in the zip so a chmod changes the artifact
+		for path, arcname in sorted(files, key=lambda item: item[1]):
+			digest.update(arcname.encode("utf-8") + b"\0")
+			digest.update(b"%o\0" % (os.stat(path).st_mode & 0o777))
+			digest.update(cls.hashFile(path).encode("utf-8"))
+
+		# Add the dependency lock files
+		for lockFile in (lockFiles if lockFiles is not None else cls.LOCK_FILES):
+			# Check if the lock file exists
+			if os.path.exists(lockFile) is False:
+				continue
+
+			digest.update(("lock:%s" % os.path.basename(lockFile)).encode("utf-8") + b"\0")
+			digest.update(cls.hashFile(lockFile).encode("utf-8"))
+
+		return digest.hexdigest()
+
+	@classmethod
+	def hashFile(cls, path):
+		""" Hash the content of a file
+
+			Returns the hash as a hex string
+		"""
+		digest = hashlib.sha256()
+		with open(path, "rb") as f:
+			for block in iter(lambda: f.read(cls.BLOCK_SIZE), b""):
+				digest.update(block)
+		return digest.hexdigest()
+
+	@classmethod
+	def getArtifact(cls, fingerprint):
+		""" Get a cached artifact
+
+			Returns path to the artifact or None
+		"""
+		# Create the path
+		path = os.path.join(cls._getCachePath("artifacts"), "%s.zip" % fingerprint)
+
+		# Check if the artifact exists
+		if os.path.exists(path) is False:
+			return None
+
+		# Mark the artifact as recently used
+		os.utime(path)
+
+		return path
+
+	@classmethod
+	def createArtifactPath(cls):
+		""" Create an empty file to write a new artifact to
+
+			The file is in the cache, outside the deployed files, so the artifact never contains itself
+			and storing it is a rename
+
+			Returns path
+		"""
+		# Create the directory
+		directory = cls._getCachePath("artifacts")
+		os.makedirs(directory, exist_ok=True)
+
+		# Create the file
+		handle, path = tempfile.mkstemp(prefix="pete_", suffix=".zip.tmp", dir=directory)
+		os.close(handle)
+
+		return path
+
+	@classmethod
+	def storeArtifact(cls, fingerprint, fromPath):
+		""" Move an artifact into the cache
+
+			Returns path to the cached artifact
+		"""
+		# Create the directory
+		directory = cls._getCachePath("artifacts")
+		os.makedirs(directory, exist_ok=True)
+
+		# Move the artifact, through a temporary name so a half copied file is never used
+		path = os.path.join(directory, "%s.zip" % fingerprint)
+		shutil.move(fromPath, path + ".tmp")
+		os.replace(path + ".tmp", path)
+
+		# Remove the old artifacts
+		cls._pruneArtifacts(directory)
+
+		return path
+
+	@classmethod
+	def getDependencyPath(cls, name, lockFiles):
+		""" Get the cache path of installed dependencies
+
+			Parameters:
+				name: Name of the package manager
+				lockFiles: The files which decide which dependencies are installed
+
+			Returns path, it only exists when the dependencies are cached
+		"""
+		# Installed packages depend on the version of the runtime and the machine
+		digest = hashlib.sha256(("%s:%s:%s" % (name, cls._getRuntimeVersion(name), platform.machine())).encode("utf-8"))
+
+		# Add the lock files
+		for lockFile in lockFiles:
+			if os.path.exists(lockFile) is True:
+				digest.update(("lock:%s" % os.path.basename(lockFile)).encode("utf-8") + b"\0")
+				digest.update(cls.hashFile(lockFile).encode("utf-8"))
+
+		# Create the path, the number of cached dependencies is limited per project
+		projectHash = hashlib.sha256(os.path.abspath(".").encode("utf-8")).hexdigest()[:16]
+		path = cls._getCachePath("dependencies", "%s-%s-%s" % (name, projectHash, digest.hexdigest()[:32]))
+
+		# Mark the dependencies as recently used
+		if os.path.exists(path) is True:
+			os.utime(path)
+
+		return path
+
+	@classmethod
+	def createDependencyBuildPath(cls, path):
+		""" Create a directory to install dependencies in, next to the final cache path
+
+			Returns path
+		"""
+		# Create the directory
+		buildPath = "%s.%i.tmp" % (path, os.getpid())
+		if os.path.exists(buildPath) is True:
+			shutil.rmtree(buildPath)
+		os.makedirs(buildPath)
+
+		return buildPath
+
+	@classmethod
+	def storeDependencies(cls, buildPath, path):
+		""" Move installed dependencies into the cache
+		"""
+		# Move the directory, this is atomic because they are on the same filesystem
+		try:
+			os.rename(buildPath, path)
+		except OSError:
+			# Another deployment stored the same dependencies first
+			shutil.rmtree(buildPath)
+
+		# Get the cached dependencies, newest first
+		directory = os.path.dirname(path)
+		prefix = os.path.basename(path).rsplit("-", 1)[0] + "-"
+		paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".tmp") is False]
+		paths.sort(key=os.path.getmtime, reverse=True)
+
+		# Remove the old dependencies of this package manager and project, and the unused ones of any project
+		oldPaths = [oldPath for oldPath in paths if os.path.basename(oldPath).startswith(prefix)][cls.MAX_DEPENDENCIES:]
+		oldPaths += [oldPath for oldPath in paths if time.time() - os.path.getmtime(oldPath) > cls.DEPENDENCY_DAYS * 24 * 60 * 60]
+		for oldPath in set(oldPaths):
+			# Dont remove dependencies another deployment may be staging from
+			if time.time() - os.path.getmtime(oldPath) < cls.DEPENDENCY_IN_USE:
+				continue
+
+			shutil.rmtree(oldPath, ignore_errors=True)
+
+	@classmethod
+	def getList(cls, name, scope, ttl=None):
+		""" Get a cached list
+
+			Parameters:
+				name: Name of the list, like buckets
+				scope: The list belongs to this scope, like the profile name
+				ttl: Number of seconds the list is valid, defaults to LIST_TTL
+
+			Returns the list or None when it is not cached or expired
+		"""
+		# Get the path
+		path = cls._getListPath(name, scope)
+
+		# Read the list
+		try:
+			with open(path, "r") as f:
+				data = json.load(f)
+		except (OSError, ValueError):
+			return None
+
+		# Check if the list expired
+		if time.time() - data.get("created", 0) > (ttl if ttl is not None else cls.LIST_TTL):
+			return None
+
+		return data.get("values")
+
+	@classmethod
+	def storeList(cls, name, scope, values):
+		""" Store a list in the cache
+
+			Parameters:
+				name: Name of the list, like buckets
+				scope: The list belongs to this scope, like the profile name
+				values: The list to store
+		"""
+		# Create the directory
+		path = cls._getListPath(name, scope)
+		os.makedirs(os.path.dirname(path), exist_ok=True)
+
+		# Write the list, through a temporary name so a half written file is never read
+		with open(path + ".tmp", "w") as f:
+			json.dump({"created": time.time(), "scope": scope, "values": list(values)}, f)
+		os.replace(path + ".tmp", path)
+
+	@classmethod
+	def _getRuntimeVersion(cls, name):
+		""" Get the version of the runtime the dependencies of a package manager are installed for
+
+			Returns the version as a string
+		"""
+		# Check if this is the NodeJS package manager
+		if name == "npm":
+			try:
+				return subprocess.check_output(["node", "--version"], stderr=subprocess.DEVNULL).decode("utf-8").strip()
+			except (OSError, subprocess.CalledProcessError):
+				return "unknown"
+
+		return "%i.%i" % (sys.version_info[0], sys.version_info[1])
+
+	@classmethod
+	def _getListPath(cls, name, scope):
+		""" Get the path to a cached list
+		"""
+		scopeHash = hashlib.sha256(str(scope).encode("utf-8")).hexdigest()[:16]
+		return cls._getCachePath("lists", "%s-%s.json" % (name, scopeHash))
+
+	@classmethod
+	def _pruneArtifacts(cls, directory):
+		""" Remove the least recently used artifacts
+		"""
+		# Get the artifacts, newest first
+		artifacts = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".zip")]
+		artifacts.sort(key=os.path.getmtime, reverse=True)
+
+		# Remove the old ones
+		for path in artifacts[cls.MAX_ARTIFACTS:]:
+			os.remove(path)
+
+	@classmethod
+	def _getCachePath(cls, *parts):
+		""" Get a path inside the cache directory
+		"""
+		# Get path to user home dir
+		home = str(Path.home())
+
+		# Create the path
+		return os.path.join(home, ".pete", "cache", *parts)
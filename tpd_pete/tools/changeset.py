@@ -0,0 +1,95 @@
+class ChangeSetTool(object):
+	# Symbol and color per kind of change
+	CHANGE_STYLES = {
+		"add": ("+", "green"),
+		"modify": ("~", "yellow"),
+		"replace": ("-/+", "magenta"),
+		"remove": ("-", "red")
+	}
+
+	@classmethod
+	def getChanges(cls, client, stackName, changeSetName):
+		""" Get all the resource changes of a change set
+
+			Returns list with a dict per change
+		"""
+		changes = []
+		nextToken = None
+
+		while True:
+			# Get a page of changes
+			if nextToken is None:
+				response = client.describe_change_set(StackName=stackName, ChangeSetName=changeSetName)
+			else:
+				response = client.describe_change_set(StackName=stackName, ChangeSetName=changeSetName, NextToken=nextToken)
+
+			# Walk through the changes
+			for change in response.get("Changes", []):
+				if change.get("Type") != "Resource":
+					continue
+				resourceChange = change["ResourceChange"]
+
+				changes.append({
+					"kind": cls._getKind(resourceChange),
+					"logicalId": resourceChange["LogicalResourceId"],
+					"type": resourceChange.get("ResourceType", ""),
+					"attributes": sorted(set(detail["Target"].get("Name", detail["Target"]["Attribute"]) for detail in resourceChange.get("Details", []) if "Target" in detail))
+				})
+
+			# Check if there are more pages
+			nextToken = response.get("NextToken")
+			if nextToken is None:
+				break
+
+		return changes
+
+	@classmethod
+	def getLines(cls, changes):
+		""" Render the changes as a diff
+
+			Returns list with tuples (text, color)
+		"""
+		# Check if there are changes
+		if len(changes) == 0:
+			return [("  No changes", None)]
+
+		# Align the names
+		width = max(len(change["logicalId"]) for change in changes)
+
+		lines = []
+		for change in sorted(changes, key=lambda item: (list(cls.CHANGE_STYLES.keys()).index(item["kind"]), item["logicalId"])):
+			symbol, color = cls.CHANGE_STYLES[change["kind"]]
+			text = "  %-3s %s  %s" % (symbol, change["logicalId"].ljust(width), change["type"])
+
+			# Show what changes
+			if len(change["attributes"]) > 0:
+				text += " (%s)" % ", ".join(change["attributes"])
+
+			lines.append((text, color))
+
+		return lines
+
+	@classmethod
+	def getSummary(cls, changes):
+		""" Count the changes per kind
+
+			Returns the summary text
+		"""
+		counts = [(kind, len([change for change in changes if change["kind"] == kind])) for kind in cls.CHANGE_STYLES]
+		return ", ".join("%i to %s" % (count, kind) for kind, count in counts if count > 0) or "no changes"
+
+	@classmethod
+	def _getKind(cls, resourceChange):
+		""" Get the kind of a resource change
+
+			Returns add, modify, replace or remove
+		"""
+		action = resourceChange.get("Action")
+
+		if action in ["Add", "Import"]:
+			return "add"
+		if action == "Remove":
+			return "remove"
+		if resourceChange.get("Replacement") in ["True", "Conditional"]:
+			return "replace"
+		return "modify"
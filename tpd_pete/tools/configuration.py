@@ -20,6 +20,16 @@ class ConfigKey(Enum):
 	DEV_SUFFIX = "dev-suffix"
 	STACK_NAME = "stack-name"
 	PARAMETERS = "parameters"
+	STREAM_UPLOAD = "stream-upload"
+	ZIP_WORKERS = "zip-workers"
+	STAGING = "staging"
+	REPRODUCIBLE_ZIP = "reproducible-zip"
+	COMPRESSION = "compression"
+	DEPENDENCY_CACHE = "dependency-cache"
+	SLIM = "slim"
+	TRANSFER = "transfer"
+	MATRIX = "matrix"
+	STACKS = "stacks"
 
 
 class ConfigurationTool(object):
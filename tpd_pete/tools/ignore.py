@@ -0,0 +1,196 @@
+import os
+import re
+
+
+class IgnoreMatcher(object):
+	""" Match paths against gitignore-style patterns
+
+		Paths are relative to the project, with forward slashes
+	"""
+
+	# Patterns which are always ignored, a .peteignore can re-include them
+	DEFAULT_PATTERNS = [
+		".git/",
+		".svn/",
+		".pete/",
+		".vscode/",
+		"seeders/",
+		"*.zip",
+		".peteignore",
+		".deployment.template.json"
+	]
+
+	def __init__(self, patterns):
+		""" Compile the patterns
+		"""
+		# Remember the compiled rules, in order
+		self.rules = []
+		for pattern in patterns:
+			rule = self._compile(pattern)
+			if rule is not None:
+				self.rules.append(rule)
+
+		# Create a single expression to quickly find paths no rule matches
+		self.fileRegex = self._combine([rule for rule in self.rules if rule["dirOnly"] is False])
+		self.dirRegex = self._combine(self.rules)
+
+	@classmethod
+	def fromFile(cls, path, defaults=True, extraPatterns=None):
+		""" Create a matcher from a .peteignore file
+
+			Parameters:
+				path: Path to the ignore file, it does not have to exist
+				defaults: Start with the default patterns
+				extraPatterns: Patterns to add after the file
+
+			Returns an IgnoreMatcher
+		"""
+		# Start with the default patterns
+		patterns = list(cls.DEFAULT_PATTERNS) if defaults is True else []
+
+		# Read the file
+		if os.path.exists(path) is True:
+			f = open(path, "r")
+			patterns.extend(f.read().splitlines())
+			f.close()
+
+		# Add the extra patterns
+		if extraPatterns is not None:
+			patterns.extend(extraPatterns)
+
+		return cls(patterns)
+
+	def isIgnored(self, path, isDir=False):
+		""" Check if a path is ignored
+
+			Parameters:
+				path: The relative path
+				isDir: If the path is a directory
+
+			Returns boolean
+		"""
+		# Check if any rule matches at all
+		regex = self.dirRegex if isDir is True else self.fileRegex
+		if regex is None or regex.match(path) is None:
+			return False
+
+		# The last matching rule decides
+		for rule in reversed(self.rules):
+			if rule["dirOnly"] is True and isDir is False:
+				continue
+			if rule["regex"].match(path) is not None:
+				return rule["negate"] is False
+
+		return False
+
+	def _compile(self, pattern):
+		""" Compile a single pattern
+
+			Returns dict with the rule or None
+		"""
+		# Strip the trailing spaces, unless they are escaped
+		if pattern.endswith("\\ ") is False:
+			pattern = pattern.rstrip()
+
+		# Skip the blank lines and comments
+		if pattern == "" or pattern[0] == "#":
+			return None
+
+		# Check if this is a negation
+		negate = False
+		if pattern[0] == "!":
+			negate = True
+			pattern = pattern[1:]
+		elif pattern[0] == "\\":
+			pattern = pattern[1:]
+
+		# Check if this pattern only matches directories
+		dirOnly = False
+		if pattern.endswith("/"):
+			dirOnly = True
+			pattern = pattern.rstrip("/")
+
+		# A pattern with a slash is relative to the project root
+		anchored = "/" in pattern
+		pattern = pattern.lstrip("/")
+		if pattern == "":
+			return None
+
+		# Create the expression
+		expression = self._translate(pattern)
+		if anchored is False:
+			expression = "(?:.*/)?" + expression
+
+		return {
+			"regex": re.compile(expression + "$"),
+			"expression": expression,
+			"negate": negate,
+			"dirOnly": dirOnly
+		}
+
+	def _translate(self, pattern):
+		""" Translate a glob pattern to a regular expression
+
+			Returns the expression
+		"""
+		expression = ""
+		i = 0
+		length = len(pattern)
+
+		while i < length:
+			char = pattern[i]
+
+			if char == "*":
+				# Check if this is a double star, as a whole path component
+				if pattern[i:i + 2] == "**" and (i == 0 or pattern[i - 1] == "/") and (i + 2 == length or pattern[i + 2] == "/"):
+					if i + 2 == length:
+						# Everything inside the directory
+						expression += ".*"
+						i += 2
+					else:
+						# Zero or more directories
+						expression += "(?:.*/)?"
+						i += 3
+					continue
+
+				# Anything but a slash
+				expression += "[^/]*"
+				while i < length and pattern[i] == "*":
+					i += 1
+				continue
+
+			elif char == "?":
+				expression += "[^/]"
+
+			elif char == "[":
+				# Find the end of the class
+				start = i + 2 if pattern[i + 1:i + 2] in ["!", "^"] else i + 1
+				end = pattern.find("]", start + 1)
+				if end == -1:
+					expression += re.escape(char)
+				else:
+					content = pattern[i + 1:end].replace("\\", "\\\\")
+					if content[0] in ["!", "^"]:
+						content = "^" + content[1:]
+					expression += "[%s]" % content
+					i = end
+
+			elif char == "\\" and i + 1 < length:
+				i += 1
+				expression += re.escape(pattern[i])
+
+			else:
+				expression += re.escape(char)
+
+			i += 1
+
+		return expression
+
+	def _combine(self, rules):
+		""" Combine the rules into a single expression
+
+			Returns a compiled expression or None
+		"""
+		if len(rules) == 0:
+			return None
+		return re.compile("(?:%s)$" % "|".join("(?:%s)" % rule["expression"] for rule in rules))
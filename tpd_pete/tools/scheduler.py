@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StageScheduler(object):
+	""" Run stages concurrently, each stage starts as soon as the stages it depends on are done
+	"""
+
+	def __init__(self, maxWorkers=4):
+		""" Create the scheduler
+		"""
+		self.maxWorkers = maxWorkers
+		self.stages = {}
+		self.failedStage = None
+
+		# The errors of the failed stages, and the stages which were skipped because of them
+		self.errors = {}
+		self.skipped = []
+
+	def add(self, name, function, dependsOn=None):
+		""" Add a stage
+
+			Parameters:
+				name: Unique name of the stage
+				function: Function to run, it receives no arguments
+				dependsOn: List of stage names which should be done first
+		"""
+		# Check if the name is unique
+		if name in self.stages:
+			raise Exception("There is already a stage named '%s'" % name)
+
+		self.stages[name] = {"function": function, "dependsOn": list(dependsOn) if dependsOn is not None else []}
+
+	def validate(self):
+		""" Check if every stage can start, before anything runs
+		"""
+		# Check if all the dependencies exist
+		for name, stage in self.stages.items():
+			for dependency in stage["dependsOn"]:
+				if dependency not in self.stages:
+					raise Exception("Stage '%s' depends on unknown stage '%s'" % (name, dependency))
+
+		# Check if the stages do not depend on each other
+		cycle = self.getCycle()
+		if len(cycle) > 0:
+			raise Exception("The stages %s depend on each other" % ", ".join(cycle))
+
+	def getCycle(self):
+		""" Find the stages which can never start, because they depend on each other
+
+			Returns sorted list with the names of the stages
+		"""
+		# Remove the stages which can start, until nothing changes
+		remaining = dict((name, stage["dependsOn"]) for name, stage in self.stages.items())
+		changed = True
+		while changed is True:
+			changed = False
+			for name in list(remaining.keys()):
+				if all(dependency not in remaining for dependency in remaining[name]):
+					del remaining[name]
+					changed = True
+
+		return sorted(remaining.keys())
+
+	def run(self, onChange=None):
+		""" Run all the stages
+
+			When a stage fails, the stages which depend on it are skipped and the other stages still run.
+			The error of the first failed stage is raised when all the stages are done.
+
+			Parameters:
+				onChange: Function called with the list of running stages, when it changes
+
+			Returns dict with the result of every stage
+		"""
+		# Check the stages first
+		self.validate()
+
+		# Remember the state of the stages
+		results = {}
+		pending = dict(self.stages)
+		running = {}
+		error = None
+		self.errors = {}
+		self.skipped = []
+
+		with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+			while len(pending) > 0 or len(running) > 0:
+				# Skip the stages which depend on a failed or skipped stage
+				changed = True
+				while changed is True:
+					changed = False
+					for name in list(pending.keys()):
+						if any(dependency in self.errors or dependency in self.skipped for dependency in pending[name]["dependsOn"]):
+							self.skipped.append(name)
+							del pending[name]
+							changed = True
+
+				# Start the stages which are ready
+				for name in list(pending.keys()):
+					if all(dependency in results for dependency in pending[name]["dependsOn"]):
+						running[executor.submit(pending[name]["function"])] = name
+						del pending[name]
+
+				# Check if everything is done
+				if len(running) == 0:
+					break
+
+				# Report the running stages
+				if onChange is not None:
+					onChange(sorted(running.values()))
+
+				# Wait for a stage to finish
+				done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+				for future in done:
+					name = running.pop(future)
+					try:
+						results[name] = future.result()
+					except Exception as e:
+						self.errors[name] = e
+
+						# Remember the first error
+						if error is None:
+							error = e
+							self.failedStage = name
+
+		# Raise the error of the first failed stage
+		if error is not None:
+			raise error
+
+		return results
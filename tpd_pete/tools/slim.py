@@ -0,0 +1,98 @@
+import os
+import shutil
+import subprocess
+
+from .ignore import IgnoreMatcher
+from .staging import StagingTool
+
+
+class SlimTool(object):
+	# Files in site-packages which are not needed on AWS Lambda
+	DEFAULT_PATTERNS = [
+		"__pycache__/",
+		"*.pyc",
+		"*.pyo",
+		"tests/",
+		"*.dist-info/",
+		"*.egg-info/",
+		"/bin/",
+		"/pip/",
+		"/setuptools/",
+		"/_distutils_hack/",
+		"/distutils-precedence.pth",
+		"/wheel/",
+		"/boto3/",
+		"/botocore/",
+		"/s3transfer/"
+	]
+
+	@classmethod
+	def getMatcher(cls, config=None):
+		""" Get the slimming rules
+
+			Parameters:
+				config: The slim config, "exclude" adds patterns after the default ones
+
+			Returns an IgnoreMatcher
+		"""
+		# Check if there is a config
+		if config is None or config is True:
+			config = {}
+
+		return IgnoreMatcher(cls.DEFAULT_PATTERNS + list(config.get("exclude", [])))
+
+	@classmethod
+	def listFiles(cls, location, config=None):
+		""" List the files of a site-packages folder which should be deployed
+
+			Returns tuple (files, removed bytes)
+		"""
+		# Get all the files and the files we keep
+		allFiles = StagingTool.listFiles(location, matcher=IgnoreMatcher([]))
+		files = StagingTool.listFiles(location, folderLinks=True, matcher=cls.getMatcher(config))
+
+		# Calculate the size we removed
+		keptPaths = set(path for path, _ in files)
+		removedBytes = sum(os.path.getsize(path) for path, _ in allFiles if path not in keptPaths and os.path.exists(path) is True)
+
+		return (files, removedBytes)
+
+	@classmethod
+	def stripLibraries(cls, paths):
+		""" Strip the debug symbols of shared libraries
+
+			Returns the number of bytes saved
+		"""
+		# Check if strip is available
+		if shutil.which("strip") is None:
+			return 0
+
+		savedBytes = 0
+
+		# Walk through the libraries
+		for path in paths:
+			# Strip to a new file, the library might be a link to the cache
+			strippedPath = path + ".stripped"
+			result = subprocess.run(["strip", "--strip-unneeded", "-o", strippedPath, path], capture_output=True)
+
+			# Check the response, some libraries can not be stripped
+			if result.returncode != 0:
+				if os.path.exists(strippedPath) is True:
+					os.remove(strippedPath)
+				continue
+
+			# Replace the library
+			savedBytes += os.path.getsize(path) - os.path.getsize(strippedPath)
+			shutil.copymode(path, strippedPath)
+			os.replace(strippedPath, path)
+
+		return savedBytes
+
+	@classmethod
+	def isLibrary(cls, path):
+		""" Check if a path is a shared library
+
+			Returns boolean
+		"""
+		fileName = os.path.basename(path)
+		return fileName.endswith(".so") or ".so." in fileName
@@ -0,0 +1,222 @@
+import time
+import uuid
+
+import botocore.exceptions
+
+
+class StackWaiter(object):
+	""" Wait for a CloudFormation stack by following its events
+
+		The waiter polls fast at first and slows down while nothing happens
+	"""
+
+	# Statuses of a stack which was changed successfully
+	SUCCESS_STATUSES = ["CREATE_COMPLETE", "UPDATE_COMPLETE", "UPDATE_COMPLETE_CLEANUP_IN_PROGRESS", "IMPORT_COMPLETE"]
+
+	# Statuses of a change set which is done
+	CHANGE_SET_STATUSES = ["CREATE_COMPLETE", "FAILED", "DELETE_COMPLETE", "DELETE_FAILED"]
+
+	# Functions to wait and to get the time of all the waiters, None uses the real clock
+	_sleep = None
+	_clock = None
+
+	def __init__(self, client, stackName, onUpdate=None, minDelay=1.0, maxDelay=10.0, factor=1.5, timeout=None, sleep=None, clock=None):
+		""" Create the waiter
+
+			Parameters:
+				client: The boto3 CloudFormation client
+				stackName: Name of the stack
+				onUpdate: Function which receives the progress text
+				minDelay: Number of seconds to wait after the first poll
+				maxDelay: Maximal number of seconds between two polls
+				factor: The delay grows with this factor while nothing happens
+				timeout: Number of seconds after which waiting fails
+				sleep: Function to wait a number of seconds, defaults to the clock of setClock or time.sleep
+				clock: Function which returns the time in seconds, defaults to the clock of setClock or time.monotonic
+		"""
+		self.client = client
+		self.stackName = stackName
+		self.onUpdate = onUpdate
+		self.minDelay = minDelay
+		self.maxDelay = maxDelay
+		self.factor = factor
+		self.timeout = timeout
+		self.sleep = sleep if sleep is not None else (StackWaiter._sleep or time.sleep)
+		self.clock = clock if clock is not None else (StackWaiter._clock or time.monotonic)
+
+		# Remember the state of the stack
+		self.lastEventId = None
+		self.token = None
+		self.status = None
+		self.resources = {}
+		self.failures = []
+		self.polls = 0
+
+	def mark(self):
+		""" Remember the newest event, call this before the stack is changed
+
+			Only the events after the mark, of the operation which is started with the token, are followed
+
+			Returns the client request token to start the operation with
+		"""
+		try:
+			events = self.client.describe_stack_events(StackName=self.stackName)["StackEvents"]
+		except botocore.exceptions.ClientError as e:
+			# Check if the stack does not exist yet
+			if "does not exist" not in e.response["Error"].get("Message", ""):
+				raise
+			events = []
+
+		self.lastEventId = events[0]["EventId"] if len(events) > 0 else None
+
+		# Create the token, CloudFormation adds it to every event of the operation
+		self.token = "pete-%s" % uuid.uuid4().hex
+		return self.token
+
+	def waitForChangeSet(self, changeSetName):
+		""" Wait until a change set is created
+
+			Returns dict with the change set
+		"""
+		startTime = self.clock()
+		delay = self.minDelay
+
+		while True:
+			# Get the change set
+			changeSet = self.client.describe_change_set(StackName=self.stackName, ChangeSetName=changeSetName)
+			self.polls += 1
+
+			# Check the status
+			if changeSet.get("Status") in self.CHANGE_SET_STATUSES:
+				return changeSet
+
+			# Wait a little longer every time
+			self._wait(startTime, delay)
+			delay = min(self.maxDelay, delay * self.factor)
+
+	def waitForStack(self):
+		""" Wait until the stack is done changing
+
+			Returns the status of the stack
+		"""
+		startTime = self.clock()
+		delay = self.minDelay
+
+		while True:
+			# Follow the new events
+			events = self._getNewEvents()
+			for event in events:
+				self._handleEvent(event)
+
+			# Check if the stack is done
+			if self.isDone(self.status) is True:
+				return self.status
+
+			# Poll faster while things happen, slower while nothing happens
+			if len(events) > 0:
+				delay = max(self.minDelay, delay / self.factor)
+			else:
+				delay = min(self.maxDelay, delay * self.factor)
+
+			# Wait a little
+			self._wait(startTime, delay)
+
+	@classmethod
+	def setClock(cls, sleep=None, clock=None):
+		""" Replace the clock of all the waiters, like a virtual clock to run without waiting
+
+			Parameters:
+				sleep: Function to wait a number of seconds, None uses time.sleep
+				clock: Function which returns the time in seconds, None uses time.monotonic
+		"""
+		cls._sleep = sleep
+		cls._clock = clock
+
+	@classmethod
+	def isDone(cls, status):
+		""" Check if a stack status is final
+
+			Returns boolean
+		"""
+		# Check if there is a status
+		if status is None:
+			return False
+
+		return status.endswith("_IN_PROGRESS") is False or status in cls.SUCCESS_STATUSES
+
+	@classmethod
+	def isSuccess(cls, status):
+		""" Check if a stack status means the change succeeded
+
+			Returns boolean
+		"""
+		return status in cls.SUCCESS_STATUSES
+
+	def _getNewEvents(self):
+		""" Get the events after the last event we have seen
+
+			Returns list with the events, oldest first
+		"""
+		events = []
+		nextToken = None
+
+		while True:
+			# Get a page of events, newest first
+			if nextToken is None:
+				response = self.client.describe_stack_events(StackName=self.stackName)
+			else:
+				response = self.client.describe_stack_events(StackName=self.stackName, NextToken=nextToken)
+			self.polls += 1
+
+			# Collect the events until the last one we have seen
+			for event in response["StackEvents"]:
+				if event["EventId"] == self.lastEventId:
+					nextToken = None
+					break
+				events.append(event)
+			else:
+				nextToken = response.get("NextToken")
+
+			# Check if there are more pages
+			if nextToken is None:
+				break
+
+		# Remember the newest event
+		if len(events) > 0:
+			self.lastEventId = events[0]["EventId"]
+
+		# Ignore the events of other operations, like an older update when the mark could not find the last event
+		if self.token is not None:
+			events = [event for event in events if event.get("ClientRequestToken") == self.token]
+
+		return list(reversed(events))
+
+	def _handleEvent(self, event):
+		""" Handle a stack event
+		"""
+		logicalId = event["LogicalResourceId"]
+		status = event["ResourceStatus"]
+
+		# Check if this is an event of the stack itself
+		if event["ResourceType"] == "AWS::CloudFormation::Stack" and logicalId == self.stackName:
+			self.status = status
+		else:
+			self.resources[logicalId] = status
+
+		# Remember the failures
+		if status.endswith("_FAILED") is True and event.get("ResourceStatusReason"):
+			self.failures.append("%s: %s" % (logicalId, event["ResourceStatusReason"]))
+
+		# Report the progress
+		if self.onUpdate is not None:
+			done = len([resourceStatus for resourceStatus in self.resources.values() if resourceStatus.endswith("_COMPLETE") is True])
+			self.onUpdate("%i/%i resources, %s %s" % (done, len(self.resources), logicalId, status))
+
+	def _wait(self, startTime, delay):
+		""" Wait before the next poll
+		"""
+		# Check if we waited too long
+		if self.timeout is not None and self.clock() - startTime + delay > self.timeout:
+			raise Exception("Timed out waiting for stack %s" % self.stackName)
+
+		self.sleep(delay)
@@ -0,0 +1,146 @@
+import fcntl
+import os
+import shutil
+
+from .ignore import IgnoreMatcher
+
+
+class StagingTool(object):
+	# The ioctl to create a copy-on-write clone of a file
+	FICLONE = 0x40049409
+
+	@classmethod
+	def getIgnoreMatcher(cls, extraPatterns=None):
+		""" Get the ignore rules of the project
+
+			Parameters:
+				extraPatterns: Patterns to ignore after the rules of the project
+
+			Returns an IgnoreMatcher
+		"""
+		return IgnoreMatcher.fromFile(".peteignore", extraPatterns=extraPatterns)
+
+	@classmethod
+	def listFiles(cls, location, folderLinks=False, matcher=None):
+		""" List the files in a location which should be deployed
+
+			Parameters:
+				location: The folder to list
+				folderLinks: Also list the links to folders
+				matcher: The IgnoreMatcher, defaults to the rules of the project
+
+			Returns a list of tuples (path, relative path)
+		"""
+		# Get the ignore rules
+		if matcher is None:
+			matcher = cls.getIgnoreMatcher()
+
+		# Remember the files
+		contentFiles = []
+
+		# Walk through the directories, ignored directories are never opened
+		directories = [""]
+		while len(directories) > 0:
+			directory = directories.pop()
+
+			with os.scandir(os.path.join(location, directory)) as entries:
+				for entry in entries:
+					# Create the relative path
+					relativePath = directory + "/" + entry.name if directory != "" else entry.name
+
+					# Check if this is a directory
+					if entry.is_dir(follow_symlinks=False) is True:
+						if matcher.isIgnored(relativePath, isDir=True) is False:
+							directories.append(relativePath)
+
+					# Check if this is a link to a directory, these are not followed
+					elif entry.is_symlink() is True and entry.is_dir() is True:
+						if folderLinks is True and matcher.isIgnored(relativePath, isDir=True) is False:
+							contentFiles.append((entry.path, relativePath))
+
+					# This is a file
+					elif matcher.isIgnored(relativePath) is False:
+						contentFiles.append((entry.path, relativePath))
+
+		return contentFiles
+
+	@classmethod
+	def stage(cls, files, destination, link=True):
+		""" Build a staging directory from a list of files
+
+			Parameters:
+				files: List of tuples (path, relative path)
+				destination: The staging directory
+				link: Use copy-on-write clones when possible, the staged files never share their content with the originals
+
+			Returns the number of files per method
+		"""
+		# The methods to try, in order of preference, a hardlink is never used because writing to it changes the original
+		methods = ["reflink", "copy"] if link is True else ["copy"]
+		counts = {"reflink": 0, "copy": 0, "symlink": 0}
+
+		# Remember the directories we created
+		createdDirs = set()
+
+		# Walk through the files
+		for path, relativePath in files:
+			# Create the directory
+			targetPath = os.path.join(destination, relativePath)
+			targetDir = os.path.dirname(targetPath)
+			if targetDir not in createdDirs:
+				os.makedirs(targetDir, exist_ok=True)
+				createdDirs.add(targetDir)
+
+			# Keep the links to folders as links
+			if os.path.islink(path) is True and os.path.isdir(path) is True:
+				os.symlink(os.readlink(path), targetPath)
+				counts["symlink"] += 1
+				continue
+
+			# Replace existing files, never write through an existing link
+			if os.path.lexists(targetPath) is True:
+				os.remove(targetPath)
+
+			# Try the methods until one works
+			for method in list(methods):
+				try:
+					cls._stageFile(method, path, targetPath)
+				except OSError:
+					# Remove the failed attempt
+					if os.path.lexists(targetPath) is True:
+						os.remove(targetPath)
+
+					# Copying is the last option
+					if method == "copy":
+						raise
+
+					# Dont try this method again
+					methods.remove(method)
+				else:
+					counts[method] += 1
+					break
+
+		return counts
+
+	@classmethod
+	def stageFolder(cls, fromPath, destination, link=True):
+		""" Place all the files of a folder in the staging directory, without ignore rules
+
+			Returns the number of files per method
+		"""
+		files = cls.listFiles(fromPath, folderLinks=True, matcher=IgnoreMatcher([]))
+		return cls.stage(files, destination, link=link)
+
+	@classmethod
+	def _stageFile(cls, method, path, targetPath):
+		""" Place a single file in the staging directory
+		"""
+		# Create a copy-on-write clone
+		if method == "reflink":
+			with open(path, "rb") as source, open(targetPath, "wb") as target:
+				fcntl.ioctl(target.fileno(), cls.FICLONE, source.fileno())
+			shutil.copystat(path, targetPath)
+
+		# Copy the file
+		else:
+			shutil.copy2(path, targetPath)
@@ -1,4 +1,5 @@
 import json
+import re
 from enum import Enum, auto as autoEnum
 
 
@@ -38,6 +39,18 @@ class TemplateTool(object):
 		"AWS::ApplicationAutoScaling::ScalableTarget"
 	]
 
+	# Parameters which exist in every template
+	PSEUDO_PARAMETERS = [
+		"AWS::AccountId",
+		"AWS::NotificationARNs",
+		"AWS::NoValue",
+		"AWS::Partition",
+		"AWS::Region",
+		"AWS::StackId",
+		"AWS::StackName",
+		"AWS::URLSuffix"
+	]
+
 	@classmethod
 	def parseTemplate(cls, templateContent):
 		""" Change the YAML templateContent to a plain JSON format
@@ -183,3 +196,121 @@ class TemplateTool(object):
 			parameters[parameterName] = parameterType
 
 		return (templateContent, parameters)
+
+	@classmethod
+	def validateTemplate(cls, templateContent, renamedItems=None):
+		""" Check the references in the templateContent, without AWS
+
+			Parameters:
+				templateContent: The parsed template
+				renamedItems: Dict with the old and new names of renamed resources
+
+			Returns list with the errors
+		"""
+		# Remember the errors
+		errors = []
+		renamedItems = renamedItems if renamedItems is not None else {}
+
+		# Get the names which can be referenced
+		parameters = set((templateContent.get("Parameters") or {}).keys()) | set(cls.PSEUDO_PARAMETERS)
+		resources = set((templateContent.get("Resources") or {}).keys())
+		conditions = set((templateContent.get("Conditions") or {}).keys())
+		mappings = set((templateContent.get("Mappings") or {}).keys())
+
+		def checkResource(name, location, reference):
+			# Check if the resource exists
+			if name in resources:
+				return
+			if name in renamedItems:
+				errors.append("%s: %s '%s', which is renamed to '%s' by the dev suffix" % (location, reference, name, renamedItems[name]))
+			else:
+				errors.append("%s: %s unknown resource '%s'" % (location, reference, name))
+
+		def checkCondition(name, location):
+			# Check if the condition exists
+			if isinstance(name, str) and name not in conditions:
+				errors.append("%s: Unknown condition '%s'" % (location, name))
+
+		def checkValue(value, location):
+			# Walk through the lists
+			if isinstance(value, list):
+				for index, item in enumerate(value):
+					checkValue(item, "%s.%i" % (location, index))
+				return
+
+			# Check if this is an object
+			if isinstance(value, dict) is False:
+				return
+
+			# Check the functions
+			for key, argument in value.items():
+				itemLocation = "%s.%s" % (location, key)
+
+				if key == "Ref" and isinstance(argument, str):
+					if argument not in parameters:
+						checkResource(argument, itemLocation, "Ref to")
+
+				elif key == "Fn::GetAtt":
+					name = argument.split(".", 1)[0] if isinstance(argument, str) else argument[0] if isinstance(argument, list) and len(argument) > 0 else None
+					if isinstance(name, str):
+						checkResource(name, itemLocation, "GetAtt of")
+
+				elif key == "Fn::Sub":
+					template = argument[0] if isinstance(argument, list) else argument
+					variables = argument[1] if isinstance(argument, list) and len(argument) > 1 and isinstance(argument[1], dict) else {}
+					if isinstance(template, str):
+						for variable in re.findall(r"\$\{([^!}][^}]*)\}", template):
+							name = variable.strip()
+							if name in variables or name in parameters:
+								continue
+							checkResource(name.split(".", 1)[0], itemLocation, "Sub of")
+
+				elif key == "Fn::FindInMap" and isinstance(argument, list) and len(argument) > 0:
+					if isinstance(argument[0], str) and argument[0] not in mappings:
+						errors.append("%s: Unknown mapping '%s'" % (itemLocation, argument[0]))
+
+				elif key == "Fn::If" and isinstance(argument, list) and len(argument) > 0:
+					checkCondition(argument[0], itemLocation)
+
+				elif key == "Condition" and isinstance(argument, str) and location.startswith("Conditions."):
+					checkCondition(argument, itemLocation)
+
+				checkValue(argument, itemLocation)
+
+		# Check the resources
+		for itemName, item in (templateContent.get("Resources") or {}).items():
+			location = "Resources.%s" % itemName
+
+			# Check the type
+			if isinstance(item, dict) is False or isinstance(item.get("Type"), str) is False:
+				errors.append("%s: Resource has no Type" % location)
+				continue
+
+			# Check the condition
+			if "Condition" in item:
+				checkCondition(item["Condition"], "%s.Condition" % location)
+
+			# Check the dependencies
+			dependsOn = item.get("DependsOn", [])
+			for name in (dependsOn if isinstance(dependsOn, list) else [dependsOn]):
+				checkResource(name, "%s.DependsOn" % location, "Depends on")
+
+			# Check the values
+			checkValue(item.get("Properties"), "%s.Properties" % location)
+			checkValue(item.get("Metadata"), "%s.Metadata" % location)
+
+		# Check the conditions
+		for name, condition in (templateContent.get("Conditions") or {}).items():
+			checkValue(condition, "Conditions.%s" % name)
+
+		# Check the outputs
+		for name, output in (templateContent.get("Outputs") or {}).items():
+			location = "Outputs.%s" % name
+			if isinstance(output, dict) is False or "Value" not in output:
+				errors.append("%s: Output has no Value" % location)
+				continue
+			if "Condition" in output:
+				checkCondition(output["Condition"], "%s.Condition" % location)
+			checkValue(output, location)
+
+		return errors
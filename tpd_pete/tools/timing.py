@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class TimingTool(object):
+	# The recorded phases
+	_phases = []
+
+	# Small numbers for the threads, for the trace viewer
+	_threads = {}
+
+	# Time the recording started
+	_startTime = time.perf_counter()
+
+	# Lock around the recorded phases
+	_lock = threading.Lock()
+
+	@classmethod
+	def start(cls):
+		""" Forget the recorded phases and start the clock
+		"""
+		with cls._lock:
+			cls._phases = []
+			cls._threads = {}
+			cls._startTime = time.perf_counter()
+
+	@classmethod
+	@contextmanager
+	def phase(cls, name, **args):
+		""" Record how long a phase takes, use it as a context manager
+
+			Parameters:
+				name: Name of the phase
+				args: Extra information about the phase, like the target
+		"""
+		startTime = time.perf_counter()
+		try:
+			yield
+		finally:
+			endTime = time.perf_counter()
+
+			with cls._lock:
+				# Get the number of the thread
+				thread = cls._threads.setdefault(threading.get_ident(), len(cls._threads) + 1)
+
+				cls._phases.append({
+					"name": name,
+					"start": startTime - cls._startTime,
+					"duration": endTime - startTime,
+					"thread": thread,
+					"args": args
+				})
+
+	@classmethod
+	def getSummary(cls):
+		""" Get the recorded phases
+
+			Returns dict with the total time, the time per phase name and all the phases
+		"""
+		with cls._lock:
+			phases = sorted(cls._phases, key=lambda item: item["start"])
+			total = time.perf_counter() - cls._startTime
+
+		# Count the time per phase name, in the order they started
+		totals = {}
+		for phase in phases:
+			if phase["name"] not in totals:
+				totals[phase["name"]] = {"count": 0, "seconds": 0.0}
+			totals[phase["name"]]["count"] += 1
+			totals[phase["name"]]["seconds"] += phase["duration"]
+
+		return {"total": total, "totals": totals, "phases": phases}
+
+	@classmethod
+	def getTrace(cls):
+		""" Get the recorded phases in the Chrome trace format, for chrome://tracing or Perfetto
+
+			Returns dict with the trace
+		"""
+		with cls._lock:
+			phases = list(cls._phases)
+
+		# Create a complete event per phase, in microseconds
+		events = []
+		for phase in phases:
+			events.append({
+				"name": phase["name"],
+				"cat": "pete",
+				"ph": "X",
+				"ts": int(phase["start"] * 1000000),
+				"dur": int(phase["duration"] * 1000000),
+				"pid": os.getpid(),
+				"tid": phase["thread"],
+				"args": phase["args"]
+			})
+
+		return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+	@classmethod
+	def save(cls, path):
+		""" Save the summary and the Chrome trace
+
+			Parameters:
+				path: Path to the summary, the trace is saved next to it with the .trace.json extension
+
+			Returns tuple (summary path, trace path)
+		"""
+		# Create the paths
+		tracePath = "%s.trace.json" % (path[:-5] if path.endswith(".json") else path)
+
+		# Save the summary
+		f = open(path, "w")
+		f.write(json.dumps(cls.getSummary(), indent=4, default=str))
+		f.close()
+
+		# Save the trace
+		f = open(tracePath, "w")
+		f.write(json.dumps(cls.getTrace(), default=str))
+		f.close()
+
+		return (path, tracePath)